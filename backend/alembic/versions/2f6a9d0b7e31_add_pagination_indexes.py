@@ -0,0 +1,32 @@
+"""Add composite indexes for keyset pagination
+
+Revision ID: 2f6a9d0b7e31
+Revises: 9c3d7a2e4b15
+Create Date: 2026-10-18 14:02:55.930114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f6a9d0b7e31'
+down_revision: Union[str, None] = '9c3d7a2e4b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # The app's create_all may already have created these on a fresh database
+    if 'ix_notifications_user_timestamp' not in {i['name'] for i in inspector.get_indexes('notifications')}:
+        op.create_index('ix_notifications_user_timestamp', 'notifications', ['user_id', 'timestamp', 'id'], unique=False)
+    if 'ix_climbs_name_id' not in {i['name'] for i in inspector.get_indexes('climbs')}:
+        op.create_index('ix_climbs_name_id', 'climbs', ['name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_climbs_name_id', table_name='climbs')
+    op.drop_index('ix_notifications_user_timestamp', table_name='notifications')
@@ -0,0 +1,30 @@
+"""Add notifications.created_at as a real DateTime
+
+Revision ID: 3a9f0c2d6e18
+Revises: e1b5f3a7c826
+Create Date: 2026-10-19 16:33:47.802214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9f0c2d6e18'
+down_revision: Union[str, None] = 'e1b5f3a7c826'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nullable with no default, so adding it does not rewrite the table.
+    # The app's create_all may already have created it on a fresh database
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('notifications')}
+    if 'created_at' not in columns:
+        op.add_column('notifications', sa.Column('created_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('notifications', 'created_at')
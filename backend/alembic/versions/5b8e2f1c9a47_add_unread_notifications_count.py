@@ -0,0 +1,38 @@
+"""Add users.unread_notifications_count
+
+Revision ID: 5b8e2f1c9a47
+Revises: 1e0dca64bb74
+Create Date: 2026-10-18 09:12:41.204517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2f1c9a47'
+down_revision: Union[str, None] = '1e0dca64bb74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's create_all may already have created the column on a fresh database
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'unread_notifications_count' not in columns:
+        op.add_column('users', sa.Column('unread_notifications_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute(
+        """
+        UPDATE users SET unread_notifications_count = (
+            SELECT count(*) FROM notifications
+            WHERE notifications.user_id = users.id AND notifications.read = false
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'unread_notifications_count')
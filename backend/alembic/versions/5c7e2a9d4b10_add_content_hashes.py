@@ -0,0 +1,47 @@
+"""Add content hashes for incremental OpenBeta sync
+
+Revision ID: 5c7e2a9d4b10
+Revises: 8e2b6d4f1a73
+Create Date: 2026-10-19 17:02:41.530118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c7e2a9d4b10'
+down_revision: Union[str, None] = '8e2b6d4f1a73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's create_all may already have created these on a fresh database.
+    # Existing rows keep a NULL hash and count as updated on their first sync
+    inspector = sa.inspect(op.get_bind())
+    for table in ('areas', 'climbs'):
+        columns = {c['name'] for c in inspector.get_columns(table)}
+        if 'content_hash' not in columns:
+            op.add_column(table, sa.Column('content_hash', sa.String(length=32), nullable=True))
+
+    if not inspector.has_table('sync_deletions'):
+        op.create_table('sync_deletions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(), nullable=False),
+            sa.Column('record_id', sa.String(), nullable=False),
+            sa.Column('detected_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_sync_deletions_id'), 'sync_deletions', ['id'], unique=False)
+        op.create_index('uq_sync_deletions_kind_record', 'sync_deletions', ['kind', 'record_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_sync_deletions_kind_record', table_name='sync_deletions')
+    op.drop_index(op.f('ix_sync_deletions_id'), table_name='sync_deletions')
+    op.drop_table('sync_deletions')
+    op.drop_column('climbs', 'content_hash')
+    op.drop_column('areas', 'content_hash')
@@ -0,0 +1,51 @@
+"""Add area_closure
+
+Revision ID: 7d1e4c8f2a60
+Revises: 2f6a9d0b7e31
+Create Date: 2026-10-18 16:25:13.477902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d1e4c8f2a60'
+down_revision: Union[str, None] = '2f6a9d0b7e31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's create_all may already have created the table on a fresh database
+    if not sa.inspect(op.get_bind()).has_table('area_closure'):
+        op.create_table('area_closure',
+            sa.Column('ancestor_id', sa.String(), nullable=False),
+            sa.Column('descendant_id', sa.String(), nullable=False),
+            sa.Column('depth', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['ancestor_id'], ['areas.id'], ),
+            sa.ForeignKeyConstraint(['descendant_id'], ['areas.id'], ),
+            sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+        )
+        op.create_index('ix_area_closure_descendant_depth', 'area_closure', ['descendant_id', 'depth'], unique=False)
+
+    op.execute("DELETE FROM area_closure")
+    op.execute(
+        """
+        INSERT INTO area_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM areas
+            UNION ALL
+            SELECT tree.ancestor_id, areas.id, tree.depth + 1
+            FROM tree JOIN areas ON areas.parent_id = tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_area_closure_descendant_depth', table_name='area_closure')
+    op.drop_table('area_closure')
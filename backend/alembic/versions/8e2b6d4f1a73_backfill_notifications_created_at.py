@@ -0,0 +1,47 @@
+"""Backfill notifications.created_at and move the indexes onto it
+
+Revision ID: 8e2b6d4f1a73
+Revises: 3a9f0c2d6e18
+Create Date: 2026-10-19 16:35:02.116790
+
+Run `python backfill.py` ahead of this on large tables; it is resumable
+and this migration then only picks up rows written since.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backfill import backfill_notification_timestamps
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2b6d4f1a73'
+down_revision: Union[str, None] = '3a9f0c2d6e18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Outside the migration transaction: each batch commits on its own and the
+    # indexes are built without blocking writes
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        backfill_notification_timestamps(bind, commit=False)
+
+        existing = {i['name'] for i in sa.inspect(bind).get_indexes('notifications')}
+        if 'ix_notifications_user_created_at' not in existing:
+            op.create_index('ix_notifications_user_created_at', 'notifications', ['user_id', 'created_at', 'id'], unique=False, postgresql_concurrently=True)
+        if 'ix_notifications_user_read_created_at' not in existing:
+            op.create_index('ix_notifications_user_read_created_at', 'notifications', ['user_id', 'read', 'created_at'], unique=False, postgresql_concurrently=True)
+        if 'ix_notifications_user_timestamp' in existing:
+            op.drop_index('ix_notifications_user_timestamp', table_name='notifications', postgresql_concurrently=True)
+        if 'ix_notifications_user_read_timestamp' in existing:
+            op.drop_index('ix_notifications_user_read_timestamp', table_name='notifications', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_notifications_user_read_timestamp', 'notifications', ['user_id', 'read', 'timestamp'], unique=False)
+    op.create_index('ix_notifications_user_timestamp', 'notifications', ['user_id', 'timestamp', 'id'], unique=False)
+    op.drop_index('ix_notifications_user_read_created_at', table_name='notifications')
+    op.drop_index('ix_notifications_user_created_at', table_name='notifications')
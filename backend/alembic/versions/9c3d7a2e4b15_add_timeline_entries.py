@@ -0,0 +1,80 @@
+"""Add timeline_entries and users.follower_count
+
+Revision ID: 9c3d7a2e4b15
+Revises: 5b8e2f1c9a47
+Create Date: 2026-10-18 11:40:07.618230
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3d7a2e4b15'
+down_revision: Union[str, None] = '5b8e2f1c9a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FANOUT_FOLLOWER_LIMIT = int(os.getenv("FANOUT_FOLLOWER_LIMIT", "5000"))
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    # The app's create_all may already have created these on a fresh database
+    columns = {c['name'] for c in inspector.get_columns('users')}
+    if 'follower_count' not in columns:
+        op.add_column('users', sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False))
+
+    if not inspector.has_table('timeline_entries'):
+        op.create_table('timeline_entries',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('feed_item_id', sa.Integer(), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['feed_item_id'], ['feed_items.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('user_id', 'feed_item_id')
+        )
+        op.create_index('ix_timeline_entries_user_timestamp', 'timeline_entries', ['user_id', 'timestamp', 'feed_item_id'], unique=False)
+
+    # user_associations may still hold duplicated follows (they are removed
+    # with its unique index in e1b5f3a7c826), so count and fan out distinct pairs
+    op.execute(
+        """
+        UPDATE users SET follower_count = (
+            SELECT count(DISTINCT user_associations.user_id) FROM user_associations
+            WHERE user_associations.friend_id = users.id
+        )
+        """
+    )
+
+    # Backfill: every author sees their own items, followers see everyone they
+    # follow unless that account is pulled on read. Self-follows are skipped,
+    # the author's own entry is already there
+    op.execute("DELETE FROM timeline_entries")
+    op.execute(
+        """
+        INSERT INTO timeline_entries (user_id, feed_item_id, timestamp)
+        SELECT user_id, id, timestamp FROM feed_items
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO timeline_entries (user_id, feed_item_id, timestamp)
+        SELECT DISTINCT user_associations.user_id, feed_items.id, feed_items.timestamp
+        FROM user_associations
+        JOIN feed_items ON feed_items.user_id = user_associations.friend_id
+        JOIN users ON users.id = feed_items.user_id
+        WHERE users.follower_count <= {FANOUT_FOLLOWER_LIMIT}
+        AND user_associations.user_id <> user_associations.friend_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_timeline_entries_user_timestamp', table_name='timeline_entries')
+    op.drop_table('timeline_entries')
+    op.drop_column('users', 'follower_count')
@@ -0,0 +1,33 @@
+"""Add row versions to areas and climbs for the response cache
+
+Revision ID: a6c2e8f4d193
+Revises: f4a1c8e3b259
+Create Date: 2026-10-19 19:24:08.317402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e8f4d193'
+down_revision: Union[str, None] = 'f4a1c8e3b259'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's create_all may already have created these on a fresh database.
+    # The server default fills existing rows without rewriting them on Postgres 11+
+    inspector = sa.inspect(op.get_bind())
+    for table in ('areas', 'climbs'):
+        columns = {c['name'] for c in inspector.get_columns(table)}
+        if 'version' not in columns:
+            op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('climbs', 'version')
+    op.drop_column('areas', 'version')
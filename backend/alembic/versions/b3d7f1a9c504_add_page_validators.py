@@ -0,0 +1,37 @@
+"""Add user versions and updated_at timestamps for conditional GETs
+
+Revision ID: b3d7f1a9c504
+Revises: a6c2e8f4d193
+Create Date: 2026-10-19 19:52:41.604219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d7f1a9c504'
+down_revision: Union[str, None] = 'a6c2e8f4d193'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's create_all may already have created these on a fresh database.
+    # Existing rows keep a NULL updated_at, so they send no Last-Modified until their next write
+    inspector = sa.inspect(op.get_bind())
+    user_columns = {c['name'] for c in inspector.get_columns('users')}
+    if 'version' not in user_columns:
+        op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    for table in ('areas', 'climbs', 'users'):
+        columns = {c['name'] for c in inspector.get_columns(table)}
+        if 'updated_at' not in columns:
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    for table in ('users', 'climbs', 'areas'):
+        op.drop_column(table, 'updated_at')
+    op.drop_column('users', 'version')
@@ -0,0 +1,40 @@
+"""Add full-text search over climbs and areas
+
+Revision ID: b7d3f9e2c541
+Revises: 5c7e2a9d4b10
+Create Date: 2026-10-19 17:41:09.284663
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from search import install_search
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3f9e2c541'
+down_revision: Union[str, None] = '5c7e2a9d4b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Postgres: generated tsvector columns + GIN indexes. SQLite: FTS5 tables
+    # with triggers. Skips whatever the app already installed at startup
+    install_search(op.get_bind())
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for table in ('climbs', 'areas'):
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search_vector')
+            op.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+    else:
+        for table in ('climbs', 'areas'):
+            for trigger in ('insert', 'update', 'delete'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{trigger}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts_keys')
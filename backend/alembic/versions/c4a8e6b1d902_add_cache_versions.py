@@ -0,0 +1,33 @@
+"""Add cache_versions
+
+Revision ID: c4a8e6b1d902
+Revises: 7d1e4c8f2a60
+Create Date: 2026-10-19 10:08:32.551706
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a8e6b1d902'
+down_revision: Union[str, None] = '7d1e4c8f2a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's create_all may already have created the table on a fresh database
+    if not sa.inspect(op.get_bind()).has_table('cache_versions'):
+        op.create_table('cache_versions',
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+    op.execute("INSERT INTO cache_versions (name, version) SELECT 'areas', 1 WHERE NOT EXISTS (SELECT 1 FROM cache_versions WHERE name = 'areas')")
+
+
+def downgrade() -> None:
+    op.drop_table('cache_versions')
@@ -0,0 +1,63 @@
+"""Make notifications.created_at non-null with a server default
+
+Revision ID: c9e4a2f7b318
+Revises: b3d7f1a9c504
+Create Date: 2026-10-19 20:14:36.275190
+
+Older code that only writes the legacy timestamp string left created_at
+NULL, which broke keyset paging on it. The server default fills it in for
+those writers from now on.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backfill import backfill_notification_timestamps
+from models import utcnow
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e4a2f7b318'
+down_revision: Union[str, None] = 'b3d7f1a9c504'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # Default first so nothing inserted meanwhile is NULL, then backfill
+        # the rows written since the last backfill, then the constraint. The
+        # batch rebuilds the table either way
+        with op.batch_alter_table('notifications') as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=utcnow())
+        backfill_notification_timestamps(bind, commit=False)
+        # Earlier backfills stored whole seconds without fractional digits,
+        # which sort before the cursors bound for the same instant
+        op.execute("UPDATE notifications SET created_at = strftime('%Y-%m-%d %H:%M:%f000', created_at) WHERE length(created_at) = 19")
+        with op.batch_alter_table('notifications') as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        return
+
+    # Setting a default only touches the catalog
+    op.alter_column('notifications', 'created_at', existing_type=sa.DateTime(), server_default=utcnow())
+
+    # Outside the migration transaction: each backfill batch commits on its
+    # own, and SET NOT NULL skips its full scan under ACCESS EXCLUSIVE because
+    # the validated check already proves it (PostgreSQL 12+). VALIDATE only
+    # takes a lock that lets reads and writes carry on
+    with op.get_context().autocommit_block():
+        backfill_notification_timestamps(bind, commit=False)
+        op.execute(
+            "ALTER TABLE notifications ADD CONSTRAINT ck_notifications_created_at_not_null "
+            "CHECK (created_at IS NOT NULL) NOT VALID"
+        )
+        op.execute("ALTER TABLE notifications VALIDATE CONSTRAINT ck_notifications_created_at_not_null")
+        op.alter_column('notifications', 'created_at', existing_type=sa.DateTime(), nullable=False)
+        op.drop_constraint('ck_notifications_created_at_not_null', 'notifications', type_='check')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('notifications') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True, server_default=None)
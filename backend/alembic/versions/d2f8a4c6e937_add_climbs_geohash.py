@@ -0,0 +1,56 @@
+"""Add climbs.geohash for spatial lookups
+
+Revision ID: d2f8a4c6e937
+Revises: b7d3f9e2c541
+Create Date: 2026-10-19 18:12:55.617402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from geo import geohash_for
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f8a4c6e937'
+down_revision: Union[str, None] = 'b7d3f9e2c541'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    # The app's create_all may already have created these on a fresh database
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'geohash' not in {c['name'] for c in inspector.get_columns('climbs')}:
+        op.add_column('climbs', sa.Column('geohash', sa.String(length=12), nullable=True))
+    if 'ix_climbs_geohash' not in {i['name'] for i in inspector.get_indexes('climbs')}:
+        op.create_index('ix_climbs_geohash', 'climbs', ['geohash'], unique=False)
+
+    # Geohashes are computed in Python, in id order, a batch at a time
+    last_id = ''
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, latitude, longitude FROM climbs "
+                "WHERE id > :last_id AND latitude IS NOT NULL AND longitude IS NOT NULL "
+                "ORDER BY id LIMIT :batch_size"
+            ),
+            {"last_id": last_id, "batch_size": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            sa.text("UPDATE climbs SET geohash = :geohash WHERE id = :id"),
+            [{"id": climb_id, "geohash": geohash_for(lat, lng)} for climb_id, lat, lng in rows],
+        )
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    op.drop_index('ix_climbs_geohash', table_name='climbs')
+    op.drop_column('climbs', 'geohash')
@@ -0,0 +1,35 @@
+"""Index climbs by area and by latitude
+
+Revision ID: d7a3c5e9b214
+Revises: c9e4a2f7b318
+Create Date: 2026-10-20 09:42:17.503861
+
+The subtree listing joined climbs on area_id with nothing to look it up
+by, and the high-latitude fallback in geo.py filters on a latitude band;
+both walked the whole climbs table.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3c5e9b214'
+down_revision: Union[str, None] = 'c9e4a2f7b318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's create_all may already have created these on a fresh database
+    existing = {i['name'] for i in sa.inspect(op.get_bind()).get_indexes('climbs')}
+    if 'ix_climbs_area_id_name_id' not in existing:
+        op.create_index('ix_climbs_area_id_name_id', 'climbs', ['area_id', 'name', 'id'], unique=False)
+    if 'ix_climbs_latitude' not in existing:
+        op.create_index('ix_climbs_latitude', 'climbs', ['latitude'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_climbs_latitude', table_name='climbs')
+    op.drop_index('ix_climbs_area_id_name_id', table_name='climbs')
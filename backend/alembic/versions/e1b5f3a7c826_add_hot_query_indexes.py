@@ -0,0 +1,78 @@
+"""Add composite indexes for the hot queries, drop ix_notifications_message
+
+Revision ID: e1b5f3a7c826
+Revises: c4a8e6b1d902
+Create Date: 2026-10-19 13:51:20.114873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b5f3a7c826'
+down_revision: Union[str, None] = 'c4a8e6b1d902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _index_names(inspector, table):
+    return {i['name'] for i in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    # Duplicates would block the unique indexes; keep the oldest row of each
+    op.execute(
+        """
+        DELETE FROM user_interests WHERE id NOT IN (
+            SELECT min(id) FROM user_interests GROUP BY user_id, climb_id
+        )
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM user_associations WHERE id NOT IN (
+            SELECT min(id) FROM user_associations GROUP BY user_id, friend_id
+        )
+        """
+    )
+    op.execute(
+        """
+        UPDATE users SET follower_count = (
+            SELECT count(*) FROM user_associations WHERE user_associations.friend_id = users.id
+        )
+        """
+    )
+
+    # The app's create_all may already have created these on a fresh database
+    existing = _index_names(inspector, 'user_interests')
+    if 'uq_user_interests_user_climb' not in existing:
+        op.create_index('uq_user_interests_user_climb', 'user_interests', ['user_id', 'climb_id'], unique=True)
+
+    existing = _index_names(inspector, 'user_associations')
+    if 'uq_user_associations_user_friend' not in existing:
+        op.create_index('uq_user_associations_user_friend', 'user_associations', ['user_id', 'friend_id'], unique=True)
+    if 'ix_user_associations_friend_id' not in existing:
+        op.create_index('ix_user_associations_friend_id', 'user_associations', ['friend_id'], unique=False)
+
+    if 'ix_feed_items_user_timestamp' not in _index_names(inspector, 'feed_items'):
+        op.create_index('ix_feed_items_user_timestamp', 'feed_items', ['user_id', sa.text('timestamp DESC')], unique=False)
+
+    existing = _index_names(inspector, 'notifications')
+    if 'ix_notifications_user_read_timestamp' not in existing:
+        op.create_index('ix_notifications_user_read_timestamp', 'notifications', ['user_id', 'read', 'timestamp'], unique=False)
+    if 'ix_notifications_message' in existing:
+        op.drop_index('ix_notifications_message', table_name='notifications')
+
+
+def downgrade() -> None:
+    op.create_index('ix_notifications_message', 'notifications', ['message'], unique=False)
+    op.drop_index('ix_notifications_user_read_timestamp', table_name='notifications')
+    op.drop_index('ix_feed_items_user_timestamp', table_name='feed_items')
+    op.drop_index('ix_user_associations_friend_id', table_name='user_associations')
+    op.drop_index('uq_user_associations_user_friend', table_name='user_associations')
+    op.drop_index('uq_user_interests_user_climb', table_name='user_interests')
@@ -0,0 +1,33 @@
+"""Key the SQLite FTS5 tables by id instead of the implicit rowid
+
+Revision ID: e8c4b2d6a915
+Revises: d7a3c5e9b214
+Create Date: 2026-10-20 11:08:53.671204
+
+climbs and areas have string primary keys, so the FTS5 tables were keyed
+by their implicit rowids, which VACUUM may renumber. Nothing changes on
+Postgres.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from search import install_search
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c4b2d6a915'
+down_revision: Union[str, None] = 'd7a3c5e9b214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Drops the rowid-keyed tables and triggers and reindexes every row,
+    # unless the app already did at startup
+    install_search(op.get_bind())
+
+
+def downgrade() -> None:
+    # The keyed tables work with the earlier schema as they are
+    pass
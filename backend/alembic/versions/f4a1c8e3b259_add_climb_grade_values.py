@@ -0,0 +1,72 @@
+"""Add numeric grade columns to climbs
+
+Revision ID: f4a1c8e3b259
+Revises: d2f8a4c6e937
+Create Date: 2026-10-19 18:47:20.903551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from grades import grade_values
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a1c8e3b259'
+down_revision: Union[str, None] = 'd2f8a4c6e937'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+INDEXES = {
+    'ix_climbs_grade_yds_value_name_id': ['grade_yds_value', 'name', 'id'],
+    'ix_climbs_grade_boulder_value_name_id': ['grade_boulder_value', 'name', 'id'],
+}
+
+
+def upgrade() -> None:
+    # The app's create_all may already have created these on a fresh database
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {c['name'] for c in inspector.get_columns('climbs')}
+    for column in ('grade_yds_value', 'grade_boulder_value'):
+        if column not in columns:
+            op.add_column('climbs', sa.Column(column, sa.Float(), nullable=True))
+
+    # Grades are parsed in Python, in id order, a batch at a time
+    last_id = ''
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, grade_yds, grade_font FROM climbs "
+                "WHERE id > :last_id AND (grade_yds IS NOT NULL OR grade_font IS NOT NULL) "
+                "ORDER BY id LIMIT :batch_size"
+            ),
+            {"last_id": last_id, "batch_size": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            sa.text(
+                "UPDATE climbs SET grade_yds_value = :grade_yds_value, "
+                "grade_boulder_value = :grade_boulder_value WHERE id = :id"
+            ),
+            [{"id": climb_id, **grade_values(yds, font)} for climb_id, yds, font in rows],
+        )
+        last_id = rows[-1][0]
+
+    # Indexed after the backfill so the updates don't maintain them row by row
+    existing = {i['name'] for i in inspector.get_indexes('climbs')}
+    for name, index_columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'climbs', index_columns, unique=False)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name='climbs')
+    op.drop_column('climbs', 'grade_boulder_value')
+    op.drop_column('climbs', 'grade_yds_value')
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy.orm import Session
+from models import Area
+from versions import AREAS, get_version
+
+# Seconds between checks of the shared version stamp; other workers' writes
+# become visible here within this window
+AREA_INDEX_CHECK_INTERVAL = float(os.getenv("AREA_INDEX_CHECK_INTERVAL", "5"))
+
+
+@dataclass(frozen=True)
+class AreaNode:
+    id: str
+    name: str
+    parent_id: str | None
+    latitude: float | None
+    longitude: float | None
+    # The row version, which keys the area's cached page and ETag
+    version: int
+    updated_at: datetime | None
+    children: tuple
+
+
+class AreaIndex:
+    """
+    Immutable snapshot of the whole area tree. Templates can use the nodes
+    exactly like Area rows (id, name, children) without touching the database.
+    """
+
+    def __init__(self, nodes: dict[str, AreaNode], roots: tuple, version: int):
+        self.nodes = nodes
+        self.roots = roots
+        self.version = version
+
+    def get(self, area_id: str) -> AreaNode | None:
+        return self.nodes.get(area_id)
+
+    def ancestors(self, area_id: str) -> list[AreaNode]:
+        # Root first, ending with the area itself
+        chain = []
+        node = self.nodes.get(area_id)
+        while node is not None:
+            chain.append(node)
+            node = self.nodes.get(node.parent_id)
+        chain.reverse()
+        return chain
+
+
+def build_area_index(db: Session, version: int) -> AreaIndex:
+    rows = db.query(Area.id, Area.name, Area.parent_id, Area.latitude, Area.longitude, Area.version, Area.updated_at).order_by(Area.name).all()
+
+    by_id = {row.id: row for row in rows}
+    children = {row.id: [] for row in rows}
+    root_ids = []
+    for row in rows:
+        if row.parent_id in children:
+            children[row.parent_id].append(row.id)
+        else:
+            root_ids.append(row.id)
+
+    # Build bottom-up (iterative post-order) so each node can hold its children
+    nodes = {}
+    for root_id in root_ids:
+        stack = [(root_id, False)]
+        while stack:
+            area_id, expanded = stack.pop()
+            if area_id in nodes:
+                continue
+            if not expanded:
+                stack.append((area_id, True))
+                stack.extend((child_id, False) for child_id in reversed(children[area_id]))
+                continue
+            row = by_id[area_id]
+            child_nodes = tuple(nodes[child_id] for child_id in children[area_id])
+            nodes[area_id] = AreaNode(
+                id=row.id,
+                name=row.name,
+                parent_id=row.parent_id,
+                latitude=row.latitude,
+                longitude=row.longitude,
+                version=row.version,
+                updated_at=row.updated_at,
+                children=child_nodes,
+            )
+
+    return AreaIndex(nodes, tuple(nodes[root_id] for root_id in root_ids), version)
+
+
+_index: AreaIndex | None = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_area_index(db: Session, refresh: bool = False) -> AreaIndex:
+    """
+    Returns this process's area index, rebuilding it when the shared "areas"
+    version stamp has moved. The stamp is read at most once per
+    AREA_INDEX_CHECK_INTERVAL unless `refresh` is set.
+    """
+    global _index, _checked_at
+    index = _index
+    if index is not None and not refresh and time.monotonic() - _checked_at < AREA_INDEX_CHECK_INTERVAL:
+        return index
+
+    # No lock is held across the queries: async routes run them on the event
+    # loop, where blocking on a lock another coroutine holds would deadlock.
+    # Concurrent callers may each rebuild once; the newest version wins
+    version = get_version(db, AREAS)
+    if index is None or index.version != version:
+        index = build_area_index(db, version)
+    with _lock:
+        if _index is None or _index.version <= index.version:
+            _index = index
+        _checked_at = time.monotonic()
+        return _index
+
+
+def find_area(db: Session, area_id: str) -> AreaNode | None:
+    # A miss may just mean another worker added the area since our last check
+    node = get_area_index(db).get(area_id)
+    if node is None:
+        node = get_area_index(db, refresh=True).get(area_id)
+    return node
+
+
+def invalidate_area_index():
+    global _index
+    _index = None
@@ -0,0 +1,62 @@
+from sqlalchemy import Integer, String, insert, literal, select
+from sqlalchemy.orm import Session, aliased
+from database import SessionLocal
+from models import Area, AreaClosure, Climb
+
+
+def add_area_closure(db: Session, area_id: str, parent_id: str | None):
+    """
+    Records a newly inserted area in the closure table: itself at depth 0 plus
+    every ancestor of its parent one level further away. The parent's rows
+    must already exist, so insert areas top-down.
+    """
+    db.add(AreaClosure(ancestor_id=area_id, descendant_id=area_id, depth=0))
+    if parent_id is None:
+        return
+
+    ancestors = select(
+        AreaClosure.ancestor_id,
+        literal(area_id, String),
+        AreaClosure.depth + 1,
+    ).where(AreaClosure.descendant_id == parent_id)
+    db.execute(
+        insert(AreaClosure).from_select(["ancestor_id", "descendant_id", "depth"], ancestors)
+    )
+
+
+def subtree_climbs(db: Session, area_id: str):
+    # Query for every climb in the area or any of its descendants
+    return (
+        db.query(Climb)
+        .join(AreaClosure, AreaClosure.descendant_id == Climb.area_id)
+        .filter(AreaClosure.ancestor_id == area_id)
+    )
+
+
+def rebuild_closure(db: Session):
+    # Regenerates the closure table from areas.parent_id with a recursive CTE
+    tree = select(
+        Area.id.label("ancestor_id"),
+        Area.id.label("descendant_id"),
+        literal(0, Integer).label("depth"),
+    ).cte("tree", recursive=True)
+    child = aliased(Area)
+    tree = tree.union_all(
+        select(tree.c.ancestor_id, child.id, tree.c.depth + 1)
+        .join(child, child.parent_id == tree.c.descendant_id)
+    )
+
+    db.query(AreaClosure).delete(synchronize_session=False)
+    db.execute(
+        insert(AreaClosure).from_select(["ancestor_id", "descendant_id", "depth"], select(tree))
+    )
+    db.commit()
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        rebuild_closure(db)
+        print(f"Rebuilt area closure: {db.query(AreaClosure).count()} rows.")
+    finally:
+        db.close()
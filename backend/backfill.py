@@ -0,0 +1,81 @@
+import argparse
+from datetime import datetime
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.engine import Connection
+
+BATCH_SIZE = 5000
+
+# Stand-in for legacy values that never parsed as a datetime
+UNPARSEABLE_TIMESTAMP = datetime(1970, 1, 1)
+
+
+def _parse_legacy_timestamp(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def backfill_notification_timestamps(connection: Connection, batch_size: int = BATCH_SIZE, commit: bool = True, progress=print) -> int:
+    """
+    Copies notifications.timestamp (legacy strings) into created_at in id
+    order, committing after every batch so no lock is held for long. Only rows
+    whose created_at is still NULL are touched, so an interrupted run resumes
+    where it stopped. Returns the number of rows backfilled.
+    """
+    remaining = connection.execute(
+        text("SELECT count(*) FROM notifications WHERE created_at IS NULL")
+    ).scalar()
+    progress(f"{remaining} notifications to backfill")
+
+    done = 0
+    unparseable = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            text(
+                "SELECT id, timestamp FROM notifications "
+                "WHERE created_at IS NULL AND id > :last_id ORDER BY id LIMIT :batch_size"
+            ),
+            {"last_id": last_id, "batch_size": batch_size},
+        ).all()
+        if not rows:
+            break
+
+        params = []
+        for notification_id, legacy in rows:
+            created_at = _parse_legacy_timestamp(legacy)
+            if created_at is None:
+                created_at = UNPARSEABLE_TIMESTAMP
+                unparseable += 1
+            params.append({"id": notification_id, "created_at": created_at})
+        # Bound as DateTime so SQLite stores SQLAlchemy's format, which keyset cursors compare against
+        connection.execute(
+            text("UPDATE notifications SET created_at = :created_at WHERE id = :id").bindparams(
+                bindparam("created_at", type_=DateTime)
+            ),
+            params,
+        )
+        if commit:
+            connection.commit()
+
+        done += len(rows)
+        last_id = rows[-1][0]
+        progress(f"backfilled {done}/{remaining} (through id {last_id})")
+
+    if unparseable:
+        progress(f"{unparseable} notifications had unparseable timestamps, set to {UNPARSEABLE_TIMESTAMP}")
+    return done
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Backfill notifications.created_at from the legacy string column.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        backfill_notification_timestamps(connection, batch_size=args.batch_size)
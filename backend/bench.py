@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+import httpx
+from bench_data import BENCH_PASSWORD, SCALES, area_id, bench_email, climb_id
+
+# Relative weights of the routes a virtual user picks from; "login" posts the login form
+ROUTE_WEIGHTS = {
+    "/": 25,
+    "/feed": 20,
+    "/notifications": 15,
+    "/users": 10,
+    "/area/{id}": 12,
+    "/climb/{id}": 15,
+    "login": 3,
+}
+
+# Recorded separately: logins from the --storm-users, who do nothing else
+STORM_ROUTE = "login storm"
+
+# Query counts come from the Server-Timing header, see instrumentation.py
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+
+RESULTS_DIR = "bench_results"
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def git_commit() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+class LoadTest:
+    """
+    Drives a running server with `virtual_users` concurrent clients, each
+    logged in as a random generated user (see bench_data.py) and requesting
+    routes by ROUTE_WEIGHTS back to back for `duration` seconds. Requests
+    made during the first `warmup` seconds are not recorded.
+    `storm_users` more clients do nothing but log in, to show how the other
+    routes hold up while password hashing is saturated.
+    """
+
+    def __init__(self, base_url: str, scale: str, virtual_users: int, duration: float, warmup: float = 5.0, seed: int = 0,
+                 storm_users: int = 0):
+        self.base_url = base_url
+        self.scale = scale
+        self.counts = SCALES[scale]
+        self.virtual_users = virtual_users
+        self.storm_users = storm_users
+        self.duration = duration
+        self.warmup = warmup
+        self.rng = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def _path(self, route: str) -> str:
+        if route == "/area/{id}":
+            return f"/area/{area_id(self.rng.randint(1, self.counts['areas']))}"
+        if route == "/climb/{id}":
+            return f"/climb/{climb_id(self.rng.randint(1, self.counts['climbs']))}"
+        return route
+
+    async def _login(self, client: httpx.AsyncClient) -> httpx.Response:
+        email = bench_email(self.rng.randint(1, self.counts["users"]))
+        return await client.post("/login", data={"email": email, "password": BENCH_PASSWORD})
+
+    def _record(self, route: str, started: float, response: httpx.Response | None, ok: bool):
+        if started < self.measure_from:
+            return
+        self.latencies[route].append(time.perf_counter() - started)
+        if not ok:
+            self.errors[route] += 1
+        if response is not None:
+            match = QUERIES_PATTERN.search(response.headers.get("server-timing", ""))
+            if match:
+                self.queries[route].append(int(match.group(1)))
+
+    async def _sign_in(self, client: httpx.AsyncClient):
+        # Setup, not measured; retries while the password pool is shedding load
+        for _ in range(20):
+            response = await self._login(client)
+            if response.status_code == 302:
+                return
+            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+        raise RuntimeError(f"Could not sign in: {response.status_code}")
+
+    async def _virtual_user(self, client: httpx.AsyncClient):
+        routes, weights = list(ROUTE_WEIGHTS), list(ROUTE_WEIGHTS.values())
+        while time.perf_counter() < self.stop_at:
+            route = self.rng.choices(routes, weights)[0]
+            started = time.perf_counter()
+            response = None
+            try:
+                if route == "login":
+                    response = await self._login(client)
+                    ok = response.status_code == 302
+                else:
+                    # A redirect here is a lost session, sent to /login
+                    response = await client.get(self._path(route))
+                    ok = response.status_code < 300
+            except httpx.HTTPError:
+                ok = False
+            self._record(route, started, response, ok)
+
+    async def _storm_user(self, client: httpx.AsyncClient):
+        # 503s are expected here once the password pool is saturated
+        while time.perf_counter() < self.stop_at:
+            started = time.perf_counter()
+            response = None
+            try:
+                response = await self._login(client)
+                ok = response.status_code == 302
+            except httpx.HTTPError:
+                ok = False
+            self._record(STORM_ROUTE, started, response, ok)
+
+    async def run(self) -> dict:
+        clients = [
+            httpx.AsyncClient(base_url=self.base_url, follow_redirects=False, timeout=60)
+            for _ in range(self.virtual_users + self.storm_users)
+        ]
+        await asyncio.gather(*(self._sign_in(client) for client in clients[:self.virtual_users]))
+        started = time.perf_counter()
+        self.measure_from = started + self.warmup
+        self.stop_at = self.measure_from + self.duration
+        users = [self._virtual_user(client) for client in clients[:self.virtual_users]]
+        users += [self._storm_user(client) for client in clients[self.virtual_users:]]
+        try:
+            await asyncio.gather(*users)
+        finally:
+            await asyncio.gather(*(client.aclose() for client in clients))
+        return self.results(time.perf_counter() - self.measure_from)
+
+    def _summary(self, latencies: list[float], queries: list[int], errors: int, elapsed: float) -> dict:
+        latencies = sorted(latencies)
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    def results(self, elapsed: float) -> dict:
+        routes = {
+            route: self._summary(self.latencies[route], self.queries[route], self.errors[route], elapsed)
+            for route in [*ROUTE_WEIGHTS, STORM_ROUTE]
+            if self.latencies[route]
+        }
+        # The storm is load, not part of the workload being measured
+        measured = [route for route in self.latencies if route != STORM_ROUTE]
+        overall = self._summary(
+            [latency for route in measured for latency in self.latencies[route]],
+            [count for route in measured for count in self.queries[route]],
+            sum(self.errors[route] for route in measured),
+            elapsed,
+        )
+        return {
+            **git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "base_url": self.base_url,
+            "scale": self.scale,
+            "virtual_users": self.virtual_users,
+            "storm_users": self.storm_users,
+            "duration_s": round(elapsed, 2),
+            "overall": overall,
+            "routes": routes,
+        }
+
+
+def print_results(results: dict):
+    users = f"{results['virtual_users']} virtual users"
+    if results.get("storm_users"):
+        users += f" + {results['storm_users']} login storm users"
+    print(f"{results['commit'] or 'unknown commit'}{' (dirty)' if results['dirty'] else ''}, "
+          f"scale {results['scale']}, {users}, {results['duration_s']}s")
+    print(f"{'route':<16}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+    for route, row in [*results["routes"].items(), ("overall", results["overall"])]:
+        queries = row["queries_per_request"]
+        print(f"{route:<16}{row['requests']:>8}{row['errors']:>6}{row['throughput_rps']:>9}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{'-' if queries is None else queries:>9}")
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Lists the routes whose p95 latency grew or throughput dropped by more
+    than `threshold` percent against `baseline`, or that run more queries.
+    """
+    regressions = []
+    for route, row in [*results["routes"].items(), ("overall", results["overall"])]:
+        before = baseline["overall"] if route == "overall" else baseline["routes"].get(route)
+        if not before:
+            continue
+        if before["p95_ms"] and (row["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 > threshold:
+            regressions.append(f"{route}: p95 {before['p95_ms']}ms -> {row['p95_ms']}ms")
+        if before["throughput_rps"] and (before["throughput_rps"] - row["throughput_rps"]) / before["throughput_rps"] * 100 > threshold:
+            regressions.append(f"{route}: throughput {before['throughput_rps']} -> {row['throughput_rps']} req/s")
+        # The overall average depends on the random route mix, so only per route
+        if route != "overall" and (row["queries_per_request"] or 0) > (before["queries_per_request"] or 0):
+            regressions.append(f"{route}: queries per request {before['queries_per_request']} -> {row['queries_per_request']}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test a running server seeded by bench_data.py.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k", help="the dataset the server was seeded with")
+    parser.add_argument("--virtual-users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds to measure, after the warmup")
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--storm-users", type=int, default=0,
+                        help="extra clients that only log in; compare against a run without them")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_DIR}/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="results file of an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=10, help="percent change counted as a regression")
+    args = parser.parse_args()
+
+    load_test = LoadTest(args.base_url, args.scale, args.virtual_users, args.duration, warmup=args.warmup, seed=args.seed,
+                         storm_users=args.storm_users)
+    results = asyncio.run(load_test.run())
+    print_results(results)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{(results['commit'] or 'unknown')[:10]}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
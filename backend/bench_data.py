@@ -0,0 +1,221 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from area_tree import rebuild_closure
+from auth import hash_password
+from bulk_loader import area_row, climb_row
+from counters import recompute_follower_counts, recompute_unread_counts
+from models import (
+    Area, Climb, FeedItem, Notification, TimelineEntry, User, UserAssociation, UserInterest,
+)
+from timeline import FANOUT_FOLLOWER_LIMIT
+from versions import AREAS, bump_version
+
+BATCH_SIZE = 5000
+
+# Row counts per dataset; the per-user numbers are averages
+SCALES = {
+    "1k": {"users": 1_000, "areas": 100, "climbs": 5_000},
+    "100k": {"users": 100_000, "areas": 5_000, "climbs": 200_000},
+    "1m": {"users": 1_000_000, "areas": 20_000, "climbs": 1_000_000},
+}
+FOLLOWS_PER_USER = 20
+INTERESTS_PER_USER = 5
+FEED_ITEMS_PER_USER = 5
+NOTIFICATIONS_PER_USER = 10
+
+# Every generated user has this password, so the load test can log in as any of them
+BENCH_PASSWORD = "bench-password"
+
+GRADES_YDS = ["5.6", "5.7", "5.8", "5.9", "5.10a", "5.10b", "5.10c", "5.10d", "5.11a", "5.11c", "5.12a", "5.13b",
+              "V0", "V2", "V4", "V6", "V8"]
+FEED_ACTIONS = ["added_friend", "interested_in_climb", "completed_climb"]
+
+# Spread over a US-sized box so the geohash cells see a realistic mix of density
+LATITUDE_RANGE = (25.0, 49.0)
+LONGITUDE_RANGE = (-124.0, -67.0)
+
+
+def bench_email(n: int) -> str:
+    return f"bench{n}@example.com"
+
+
+def area_id(n: int) -> str:
+    return f"bench-area-{n}"
+
+
+def climb_id(n: int) -> str:
+    return f"bench-climb-{n}"
+
+
+def _popular(rng: random.Random, count: int) -> int:
+    # 1-based id, log-uniformly distributed: half of all picks land in the
+    # first sqrt(count) ids, so a few users and climbs get most follows and interests
+    return min(int(count ** rng.random()), count)
+
+
+class DatasetGenerator:
+    """
+    Writes a deterministic synthetic dataset (the same `seed` gives the same
+    rows) into an empty database: users, follows, interests, feed items and
+    their timeline entries, notifications, and an area tree with climbs.
+    Rows go in with multi-row INSERTs of `batch_size`, committed per batch.
+    """
+
+    def __init__(self, db: Session, scale: str, seed: int = 0, batch_size: int = BATCH_SIZE, progress=print):
+        self.db = db
+        self.counts = SCALES[scale]
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.progress = progress
+        self.now = datetime(2024, 1, 1)
+
+    def _write(self, model, rows):
+        # Consumes a row generator in batches; returns the number of rows written
+        written = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.db.execute(insert(model), batch)
+                self.db.commit()
+                written += len(batch)
+                batch = []
+        if batch:
+            self.db.execute(insert(model), batch)
+            self.db.commit()
+            written += len(batch)
+        self.progress(f"{model.__tablename__}: {written} rows")
+        return written
+
+    def _timestamp(self) -> datetime:
+        return self.now - timedelta(seconds=self.rng.randint(0, 90 * 24 * 3600))
+
+    def users(self):
+        password_hash = hash_password(BENCH_PASSWORD)
+        for n in range(1, self.counts["users"] + 1):
+            yield {"id": n, "name": f"Bench User {n}", "email": bench_email(n), "password_hash": password_hash}
+
+    def follows(self):
+        users = self.counts["users"]
+        for user_id in range(1, users + 1):
+            friends = {_popular(self.rng, users) for _ in range(self.rng.randint(0, 2 * FOLLOWS_PER_USER))}
+            friends.discard(user_id)
+            for friend_id in sorted(friends):
+                yield {"user_id": user_id, "friend_id": friend_id, "followed_at": self._timestamp()}
+
+    def areas(self):
+        lat_low, lat_high = LATITUDE_RANGE
+        lng_low, lng_high = LONGITUDE_RANGE
+        for n in range(1, self.counts["areas"] + 1):
+            # The first ten are roots; the rest hang off an earlier area
+            parent = area_id(self.rng.randint(1, n - 1)) if n > 10 else None
+            yield area_row({
+                "id": area_id(n),
+                "area_name": f"Bench Area {n}",
+                "metadata": {"lat": self.rng.uniform(lat_low, lat_high), "lng": self.rng.uniform(lng_low, lng_high)},
+            }, parent)
+
+    def climbs(self):
+        lat_low, lat_high = LATITUDE_RANGE
+        lng_low, lng_high = LONGITUDE_RANGE
+        for n in range(1, self.counts["climbs"] + 1):
+            yield climb_row({
+                "id": climb_id(n),
+                "name": f"Bench Climb {n}",
+                "grades": {"yds": self.rng.choice(GRADES_YDS)},
+                "content": {"description": "Synthetic climb for load testing.", "location": "", "protection": ""},
+                "metadata": {"lat": self.rng.uniform(lat_low, lat_high), "lng": self.rng.uniform(lng_low, lng_high)},
+            }, area_id(self.rng.randint(1, self.counts["areas"])))
+
+    def interests(self):
+        for user_id in range(1, self.counts["users"] + 1):
+            climbs = {_popular(self.rng, self.counts["climbs"]) for _ in range(self.rng.randint(0, 2 * INTERESTS_PER_USER))}
+            for n in sorted(climbs):
+                yield {"user_id": user_id, "climb_id": climb_id(n)}
+
+    def feed_items(self):
+        for user_id in range(1, self.counts["users"] + 1):
+            for _ in range(self.rng.randint(0, 2 * FEED_ITEMS_PER_USER)):
+                yield {
+                    "user_id": user_id,
+                    "action": self.rng.choice(FEED_ACTIONS),
+                    "details": f"Bench Climb {self.rng.randint(1, self.counts['climbs'])}",
+                    "timestamp": self._timestamp(),
+                }
+
+    def notifications(self):
+        users = self.counts["users"]
+        for user_id in range(1, users + 1):
+            for _ in range(self.rng.randint(0, 2 * NOTIFICATIONS_PER_USER)):
+                created_at = self._timestamp()
+                yield {
+                    "user_id": user_id,
+                    "source_user_id": self.rng.randint(1, users),
+                    "message": "Someone started following you",
+                    "read": self.rng.random() < 0.7,
+                    "timestamp": created_at,
+                    "legacy_timestamp": str(created_at),
+                    "notification_type": "friend_request",
+                }
+
+    def timelines(self):
+        # Same rows timeline.publish would have written, one range of readers at
+        # a time; authors over the fan-out limit are read at request time instead
+        step = max(self.batch_size // (2 * FOLLOWS_PER_USER * FEED_ITEMS_PER_USER), 1)
+        columns = ["user_id", "feed_item_id", "timestamp"]
+        for low in range(1, self.counts["users"] + 1, step):
+            readers = UserAssociation.user_id.between(low, low + step - 1)
+            followed = (
+                select(UserAssociation.user_id, FeedItem.id, FeedItem.timestamp)
+                .join(FeedItem, FeedItem.user_id == UserAssociation.friend_id)
+                .join(User, User.id == UserAssociation.friend_id)
+                .where(readers, User.follower_count <= FANOUT_FOLLOWER_LIMIT)
+            )
+            own = select(FeedItem.user_id, FeedItem.id, FeedItem.timestamp).where(
+                FeedItem.user_id.between(low, low + step - 1)
+            )
+            self.db.execute(insert(TimelineEntry).from_select(columns, followed))
+            self.db.execute(insert(TimelineEntry).from_select(columns, own))
+            self.db.commit()
+        self.progress(f"{TimelineEntry.__tablename__}: {self.db.query(TimelineEntry).count()} rows")
+
+    def run(self):
+        if self.db.query(User.id).first() is not None:
+            raise RuntimeError("The database already has users; generate into an empty database")
+
+        started = time.perf_counter()
+        self._write(User, self.users())
+        self._write(UserAssociation, self.follows())
+        self._write(Area, self.areas())
+        rebuild_closure(self.db)
+        bump_version(self.db, AREAS)
+        self.db.commit()
+        self._write(Climb, self.climbs())
+        self._write(UserInterest, self.interests())
+        self._write(FeedItem, self.feed_items())
+        recompute_follower_counts(self.db)
+        self.timelines()
+        self._write(Notification, self.notifications())
+        recompute_unread_counts(self.db)
+        self.progress(f"Generated the {self.counts['users']}-user dataset in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset for load testing (see bench.py).")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        DatasetGenerator(db, args.scale, seed=args.seed, batch_size=args.batch_size).run()
+    finally:
+        db.close()
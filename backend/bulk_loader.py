@@ -0,0 +1,284 @@
+import hashlib
+import json
+import time
+from collections import Counter
+from sqlalchemy import String, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from area_tree import rebuild_closure
+from geo import geohash_for
+from grades import grade_values
+from models import Area, AreaClosure, Climb, SyncDeletion, User, UserInterest
+from versions import AREAS, bump_row_versions, bump_version
+
+BATCH_SIZE = 5000
+
+AREA_COLUMNS = ["name", "parent_id", "latitude", "longitude"]
+CLIMB_COLUMNS = [
+    "name", "grade_yds", "grade_font", "description", "location", "protection",
+    "area_id", "latitude", "longitude",
+]
+# Computed from CLIMB_COLUMNS, so not part of the content hash
+DERIVED_CLIMB_COLUMNS = ["content_hash", "geohash", "grade_yds_value", "grade_boulder_value"]
+
+# Ids per IN (...) lookup, well under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 900
+
+
+def _insert(db: Session):
+    # ON CONFLICT is dialect-specific in SQLAlchemy
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise RuntimeError(f"Bulk upserts are not supported on {dialect}")
+
+
+def upsert(db: Session, model, rows: list[dict], index_elements: list[str], update_columns: list[str]):
+    """
+    INSERT ... ON CONFLICT DO UPDATE for a batch of rows, sent as one
+    executemany (batched into multi-row VALUES by SQLAlchemy). With no
+    update_columns conflicting rows are left alone.
+    """
+    if not rows:
+        return
+    stmt = _insert(db)(model)
+    if update_columns:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: stmt.excluded[column] for column in update_columns},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    db.execute(stmt, rows)
+
+
+def content_hash(row: dict, columns: list[str]) -> str:
+    # Digest of the imported fields; any upstream change alters it
+    payload = json.dumps([row[column] for column in columns], default=str)
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def _chunks(items: list, size: int = LOOKUP_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def area_row(area_data: dict, parent_id: str | None) -> dict:
+    metadata = area_data.get("metadata") or {}
+    row = {
+        "id": str(area_data["id"]),
+        "name": area_data["area_name"],
+        "parent_id": parent_id,
+        "latitude": metadata.get("lat"),
+        "longitude": metadata.get("lng"),
+    }
+    row["content_hash"] = content_hash(row, AREA_COLUMNS)
+    return row
+
+
+def climb_row(climb_data: dict, area_id: str) -> dict:
+    grades = climb_data.get("grades") or {}
+    content = climb_data.get("content") or {}
+    metadata = climb_data.get("metadata") or {}
+    row = {
+        "id": str(climb_data["id"]),
+        "name": climb_data["name"],
+        "grade_yds": grades.get("yds"),
+        "grade_font": grades.get("font"),
+        "description": content.get("description"),
+        "location": content.get("location"),
+        "protection": content.get("protection"),
+        "area_id": area_id,
+        "latitude": metadata.get("lat"),
+        "longitude": metadata.get("lng"),
+    }
+    row["content_hash"] = content_hash(row, CLIMB_COLUMNS)
+    row["geohash"] = geohash_for(row["latitude"], row["longitude"])
+    row.update(grade_values(row["grade_yds"], row["grade_font"]))
+    return row
+
+
+class BulkLoader:
+    """
+    Buffers parsed OpenBeta areas and climbs and writes them in batches of
+    `batch_size` rows, one transaction per batch. Areas must be added before
+    their children and climbs, which is the order the API returns them in.
+
+    Each batch is diffed against the stored content hashes first, so rows
+    that have not changed upstream are counted but never rewritten.
+    """
+
+    def __init__(self, db: Session, batch_size: int = BATCH_SIZE, on_flush=None):
+        self.db = db
+        self.batch_size = batch_size
+        # Called after each batch commits, e.g. to checkpoint progress
+        self.on_flush = on_flush
+        self.areas = {}
+        self.climbs = {}
+        # Parent of every area seen during this import, to build closure rows
+        self.parents = {}
+        self.seen_climbs = set()
+        # inserted / updated / unchanged / deleted per kind
+        self.stats = {"areas": Counter(), "climbs": Counter()}
+        # Set when an existing area moved, which the closure rows can't follow
+        self.reparented = False
+        self.started_at = time.perf_counter()
+
+    def add_area(self, area_data: dict, parent_id: str | None = None) -> str:
+        row = area_row(area_data, parent_id)
+        self.areas[row["id"]] = row
+        self.parents[row["id"]] = parent_id
+        self._maybe_flush()
+        return row["id"]
+
+    def add_climb(self, climb_data: dict, area_id: str) -> str:
+        row = climb_row(climb_data, area_id)
+        self.climbs[row["id"]] = row
+        self.seen_climbs.add(row["id"])
+        self._maybe_flush()
+        return row["id"]
+
+    def _maybe_flush(self):
+        if len(self.areas) + len(self.climbs) >= self.batch_size:
+            self.flush()
+
+    def _closure_rows(self, area_id: str) -> tuple[list[dict], tuple | None]:
+        """
+        Closure rows for the ancestors seen during this import. If the chain
+        reaches an area loaded earlier (a resumed import), also returns
+        (area_id, depth, that area) so its stored ancestors can be grafted on.
+        """
+        rows = []
+        ancestor_id, depth = area_id, 0
+        while ancestor_id in self.parents:
+            rows.append({"ancestor_id": ancestor_id, "descendant_id": area_id, "depth": depth})
+            ancestor_id, depth = self.parents[ancestor_id], depth + 1
+        if ancestor_id is None:
+            return rows, None
+        return rows, (area_id, depth, ancestor_id)
+
+    def _write_closure(self, areas: list[dict]):
+        rows, grafts = [], []
+        for area in areas:
+            area_rows, graft = self._closure_rows(area["id"])
+            rows.extend(area_rows)
+            if graft:
+                grafts.append(graft)
+        upsert(self.db, AreaClosure, rows, ["ancestor_id", "descendant_id"], [])
+
+        columns = ["ancestor_id", "descendant_id", "depth"]
+        for area_id, offset, known_id in grafts:
+            stored = select(
+                AreaClosure.ancestor_id, literal(area_id, String), AreaClosure.depth + offset
+            ).where(AreaClosure.descendant_id == known_id)
+            self.db.execute(
+                _insert(self.db)(AreaClosure).from_select(columns, stored)
+                .on_conflict_do_nothing(index_elements=columns[:2])
+            )
+
+    def _diff(self, model, rows: dict, stats: Counter) -> tuple[list[dict], list[dict]]:
+        # Splits buffered rows into (inserted, updated), dropping unchanged ones
+        stored = {}
+        for ids in _chunks(list(rows)):
+            columns = [model.id, model.content_hash] + ([model.parent_id] if model is Area else [])
+            stored.update((row.id, row) for row in self.db.execute(select(*columns).where(model.id.in_(ids))))
+
+        inserted, updated = [], []
+        for row in rows.values():
+            existing = stored.get(row["id"])
+            if existing is None:
+                inserted.append(row)
+            elif existing.content_hash != row["content_hash"]:
+                updated.append(row)
+                if model is Area and existing.parent_id != row["parent_id"]:
+                    self.reparented = True
+        stats.update(inserted=len(inserted), updated=len(updated), unchanged=len(rows) - len(inserted) - len(updated))
+        return inserted, updated
+
+    def flush(self):
+        if not self.areas and not self.climbs:
+            return
+        try:
+            new_areas, changed_areas = self._diff(Area, self.areas, self.stats["areas"])
+            new_climbs, changed_climbs = self._diff(Climb, self.climbs, self.stats["climbs"])
+            upsert(self.db, Area, new_areas + changed_areas, ["id"], AREA_COLUMNS + ["content_hash"])
+            self._write_closure(new_areas)
+            upsert(self.db, Climb, new_climbs + changed_climbs, ["id"], CLIMB_COLUMNS + DERIVED_CLIMB_COLUMNS)
+            self._bump_page_versions(new_areas, changed_areas, new_climbs, changed_climbs)
+            if new_areas or changed_areas or new_climbs or changed_climbs:
+                # Let every worker's area index pick up this batch's areas and
+                # page versions, in the transaction that writes them
+                bump_version(self.db, AREAS)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self.areas.clear()
+        self.climbs.clear()
+        if self.on_flush:
+            self.on_flush()
+
+    def _bump_page_versions(self, new_areas, changed_areas, new_climbs, changed_climbs):
+        # Moves the pages this batch affects to new cache keys and ETags: an area's page
+        # lists its children and climbs, and every page below a changed area
+        # shows its name in the breadcrumb
+        listings = {row["parent_id"] for row in new_areas + changed_areas}
+        listings |= {row["area_id"] for row in new_climbs + changed_climbs}
+        listings.discard(None)
+        for ids in _chunks(sorted(listings)):
+            bump_row_versions(self.db, Area, Area.id.in_(ids))
+        for ids in _chunks([row["id"] for row in changed_areas]):
+            subtree = select(AreaClosure.descendant_id).where(AreaClosure.ancestor_id.in_(ids))
+            bump_row_versions(self.db, Area, Area.id.in_(subtree))
+            bump_row_versions(self.db, Climb, Climb.area_id.in_(subtree))
+        for ids in _chunks([row["id"] for row in changed_climbs]):
+            bump_row_versions(self.db, Climb, Climb.id.in_(ids))
+            # Profiles list the climbs their users are projecting
+            projecting = select(UserInterest.user_id).where(UserInterest.climb_id.in_(ids))
+            bump_row_versions(self.db, User, User.id.in_(projecting))
+
+    def record_deletions(self, root_ids: list[str]):
+        """
+        After a complete walk of the trees under root_ids, records every stored
+        area and climb in them that the walk did not see, and clears records
+        that have reappeared upstream.
+        """
+        self.flush()
+        subtree = select(AreaClosure.descendant_id).where(AreaClosure.ancestor_id.in_(root_ids))
+        stored = {
+            ("area", "areas"): set(self.db.scalars(subtree)),
+            ("climb", "climbs"): set(self.db.scalars(select(Climb.id).where(Climb.area_id.in_(subtree)))),
+        }
+        seen = {"area": self.parents.keys(), "climb": self.seen_climbs}
+
+        for (kind, stat), stored_ids in stored.items():
+            present = stored_ids & seen[kind]
+            deleted = stored_ids - present
+            upsert(self.db, SyncDeletion, [{"kind": kind, "record_id": record_id} for record_id in deleted],
+                   ["kind", "record_id"], [])
+            recorded = set(self.db.scalars(select(SyncDeletion.record_id).where(SyncDeletion.kind == kind)))
+            for ids in _chunks(list(recorded & present)):
+                self.db.query(SyncDeletion).filter(
+                    SyncDeletion.kind == kind, SyncDeletion.record_id.in_(ids)
+                ).delete(synchronize_session=False)
+            self.stats[stat]["deleted"] = len(deleted)
+        self.db.commit()
+
+    def finish(self):
+        self.flush()
+        if self.reparented:
+            rebuild_closure(self.db)
+            self.db.commit()
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started_at
+        rows = sum(sum(stats.values()) - stats["deleted"] for stats in self.stats.values())
+        lines = [
+            f"{kind.capitalize()}: {stats['inserted']} inserted, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged, {stats['deleted']} deleted"
+            for kind, stats in self.stats.items()
+        ]
+        lines.append(f"Processed {rows} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/sec)")
+        return "\n".join(lines)
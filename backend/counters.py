@@ -0,0 +1,81 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Notification, User, UserAssociation
+from principal import invalidate_user_on_commit
+
+
+def increment_unread(db: Session, user_id: int, by: int = 1):
+    # Runs inside the caller's transaction, next to the notification insert
+    db.query(User).filter(User.id == user_id).update(
+        {User.unread_notifications_count: User.unread_notifications_count + by},
+        synchronize_session=False,
+    )
+    invalidate_user_on_commit(db, user_id)
+
+
+def decrement_unread(db: Session, user_id: int, by: int = 1):
+    db.query(User).filter(
+        User.id == user_id, User.unread_notifications_count >= by
+    ).update(
+        {User.unread_notifications_count: User.unread_notifications_count - by},
+        synchronize_session=False,
+    )
+    invalidate_user_on_commit(db, user_id)
+
+
+def increment_followers(db: Session, user_id: int, by: int = 1):
+    db.query(User).filter(User.id == user_id).update(
+        {User.follower_count: User.follower_count + by},
+        synchronize_session=False,
+    )
+    invalidate_user_on_commit(db, user_id)
+
+
+def add_notification(db: Session, notification: Notification):
+    db.add(notification)
+    if not notification.read:
+        increment_unread(db, notification.user_id)
+
+
+def recompute_unread_counts(db: Session) -> int:
+    """
+    Repairs every user's unread counter from the notifications table.
+    Returns the number of users whose counter had drifted.
+    """
+    actual = (
+        select(func.count(Notification.id))
+        .where(Notification.user_id == User.id, Notification.read == False)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    repaired = db.query(User).filter(User.unread_notifications_count != actual).update(
+        {User.unread_notifications_count: actual}, synchronize_session=False
+    )
+    db.commit()
+    return repaired
+
+
+def recompute_follower_counts(db: Session) -> int:
+    actual = (
+        select(func.count(UserAssociation.id))
+        .where(UserAssociation.friend_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    repaired = db.query(User).filter(User.follower_count != actual).update(
+        {User.follower_count: actual}, synchronize_session=False
+    )
+    db.commit()
+    return repaired
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        repaired = recompute_unread_counts(db)
+        print(f"Repaired unread notification counts for {repaired} users.")
+        repaired = recompute_follower_counts(db)
+        print(f"Repaired follower counts for {repaired} users.")
+    finally:
+        db.close()
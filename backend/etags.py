@@ -0,0 +1,86 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request
+from fastapi.responses import Response
+from templating import TEMPLATES_DIR
+
+
+def _templates_digest() -> str:
+    # Part of every ETag, so a deploy that changes the markup changes them all
+    digest = hashlib.md5()
+    for name in sorted(os.listdir(TEMPLATES_DIR)):
+        with open(os.path.join(TEMPLATES_DIR, name), "rb") as f:
+            digest.update(name.encode() + f.read())
+    return digest.hexdigest()
+
+
+TEMPLATES_DIGEST = _templates_digest()
+
+
+def viewer_key(request: Request) -> tuple:
+    # The layout around every page shows the viewer's name and unread badge
+    user = getattr(request.state, "current_user", None)
+    if user is None:
+        return ("anonymous",)
+    return (user.id, getattr(request.state, "unread_notifications_count", 0))
+
+
+def page_etag(request: Request, kind: str, entity_id, version: int) -> str:
+    """
+    Weak ETag for an entity page, computed from the entity's version column
+    and the viewer without rendering anything. Writes that change what the
+    page shows bump the version (see versions.bump_row_versions).
+    """
+    parts = [TEMPLATES_DIGEST, kind, entity_id, version, *viewer_key(request)]
+    return 'W/"%s"' % hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def _validators(etag: str, last_modified: datetime | None) -> dict:
+    headers = {
+        "ETag": etag,
+        # Per-viewer pages: browsers may keep them but must revalidate
+        "Cache-Control": "private, no-cache",
+        "Vary": "Cookie",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def _weak_match(etag: str, if_none_match: str) -> bool:
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in tags}
+
+
+def not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> Response | None:
+    """
+    Returns a 304 if the request's validators still match, else None.
+    If-None-Match wins when both are sent. If-Modified-Since alone is only
+    trusted for anonymous viewers, since a signed-in viewer's layout can
+    change without the entity's timestamp moving.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        matched = _weak_match(etag, if_none_match)
+    else:
+        matched = False
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and last_modified is not None and viewer_key(request) == ("anonymous",):
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                since = None
+            # HTTP dates have whole seconds
+            if since is not None and since.tzinfo is not None:
+                matched = last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    if matched:
+        return Response(status_code=304, headers=_validators(etag, last_modified))
+    return None
+
+
+def with_validators(response: Response, etag: str, last_modified: datetime | None = None) -> Response:
+    response.headers.update(_validators(etag, last_modified))
+    return response
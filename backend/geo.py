@@ -0,0 +1,139 @@
+import math
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Session
+from models import Climb
+
+# Climbs are indexed by geohash: nearby points share a prefix, so a cell is
+# a range scan on the B-tree index. Nearest-neighbour lookups scan a 3x3
+# block of cells around the point, widening the cells until the block is
+# guaranteed to hold the answer.
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+GEOHASH_PRECISION = 12
+
+# Finest cells tried by nearby_climbs(): about 150m across
+NEARBY_START_PRECISION = 7
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate longitude, latitude, starting with longitude
+        span, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        mid = (span[0] + span[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            span[0] = mid
+        else:
+            span[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_for(lat: float | None, lng: float | None) -> str | None:
+    if lat is None or lng is None:
+        return None
+    return encode(lat, lng)
+
+
+@event.listens_for(Climb, "before_insert")
+@event.listens_for(Climb, "before_update")
+def _sync_geohash(mapper, connection, climb: Climb):
+    # ORM writes keep geohash current; bulk inserts set it themselves
+    climb.geohash = geohash_for(climb.latitude, climb.longitude)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    # (height, width) of a cell in degrees
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lng_bits
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _block(lat: float, lng: float, precision: int) -> tuple[set[str], float]:
+    """
+    The cell holding (lat, lng) and its eight neighbours, plus the distance
+    in km from the point that the block is guaranteed to cover.
+    """
+    height, width = cell_size(precision)
+    cells = set()
+    for d_lat in (-height, 0, height):
+        for d_lng in (-width, 0, width):
+            cell_lat = max(-90.0, min(90.0, lat + d_lat))
+            cell_lng = (lng + d_lng + 180) % 360 - 180
+            cells.add(encode(cell_lat, cell_lng, precision))
+
+    # A neighbour ring is at least one cell wide; east-west that narrows
+    # with latitude, so measure it where the block is closest to a pole
+    widest_lat = min(90.0, abs(lat) + height)
+    cover = min(height, width * math.cos(math.radians(widest_lat))) * KM_PER_DEGREE
+    return cells, cover
+
+
+def _prefix_range(cell: str):
+    # [cell, next cell) in geohash order, avoiding LIKE, which collations can keep off the index
+    stripped = cell.rstrip(BASE32[-1])
+    if not stripped:
+        return Climb.geohash >= cell
+    upper = stripped[:-1] + BASE32[BASE32.index(stripped[-1]) + 1]
+    return and_(Climb.geohash >= cell, Climb.geohash < upper)
+
+
+def _within(lat: float, lng: float, candidates, reach: float) -> list[tuple[float, str]]:
+    found = []
+    for climb_id, climb_lat, climb_lng in candidates:
+        distance = haversine_km(lat, lng, climb_lat, climb_lng)
+        if distance <= reach:
+            found.append((distance, climb_id))
+    return found
+
+
+def nearby_climbs(db: Session, lat: float, lng: float, radius_km: float, k: int) -> list[tuple[Climb, float]]:
+    """
+    Up to `k` climbs within `radius_km` of the point, nearest first, as
+    (climb, distance in km) pairs.
+    """
+    columns = (Climb.id, Climb.latitude, Climb.longitude)
+    reach = 0.0
+    for precision in range(NEARBY_START_PRECISION, 0, -1):
+        cells, cover = _block(lat, lng, precision)
+        # Each block contains the finer ones, so what they covered stays covered
+        # even where the coarser block's own guarantee is smaller (near the poles)
+        reach = max(reach, min(cover, radius_km))
+        candidates = db.query(*columns).filter(or_(*(_prefix_range(cell) for cell in sorted(cells))))
+        found = _within(lat, lng, candidates, reach)
+
+        # Everything within `reach` is in `found`, so it's complete once it
+        # holds k climbs or reach covers the whole radius
+        if len(found) >= k or reach >= radius_km:
+            break
+    else:
+        # No block covers the radius, which happens at high latitudes where
+        # cells narrow east-west: scan the latitude band the radius spans
+        band = radius_km / KM_PER_DEGREE
+        candidates = db.query(*columns).filter(
+            Climb.geohash.isnot(None), Climb.latitude.between(lat - band, lat + band)
+        )
+        found = _within(lat, lng, candidates, radius_km)
+
+    nearest = sorted(found)[:k]
+    climbs = {climb.id: climb for climb in db.query(Climb).filter(Climb.id.in_([climb_id for _, climb_id in nearest]))}
+    return [(climbs[climb_id], distance) for distance, climb_id in nearest]
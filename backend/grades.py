@@ -0,0 +1,140 @@
+import re
+from fastapi import HTTPException
+from sqlalchemy import event
+from models import Climb
+
+# Free-form grade strings are normalized into two sortable numbers:
+#   grade_yds_value      routes, where 5.x is x (5.9 -> 9.0, 5.10a -> 10.0,
+#                        5.10d -> 10.75); 4th and 3rd class are -1 and -2
+#   grade_boulder_value  boulders on the V scale (VB -> -1, V4 -> 4.0), with
+#                        Font grades converted to their V equivalent
+
+YDS_PATTERN = re.compile(r"^\s*5\.(\d{1,2})\s*([abcd](?:\s*/\s*[abcd])?)?\s*([+-])?", re.IGNORECASE)
+CLASS_PATTERN = re.compile(r"^\s*([34])(?:st|nd|rd|th)?\s*class", re.IGNORECASE)
+V_PATTERN = re.compile(r"^\s*V\s*(B|\d{1,2})(?:\s*[-/]\s*(\d{1,2}))?\s*([+-])?", re.IGNORECASE)
+FONT_PATTERN = re.compile(r"^\s*([3-9])\s*([abc])?\s*(\+)?", re.IGNORECASE)
+
+LETTER_OFFSETS = {"a": 0.0, "b": 0.25, "c": 0.5, "d": 0.75}
+
+# Font grade -> V scale; "+" grades sit between their neighbours so the
+# Font ordering survives where two Font grades share a V grade
+FONT_TO_V = {
+    "3": -1.5, "3+": -1.25, "4": -0.5, "4+": 0.0, "5": 1.0, "5+": 2.0,
+    "6A": 3.0, "6A+": 3.5, "6B": 4.0, "6B+": 4.5, "6C": 5.0, "6C+": 5.5,
+    "7A": 6.0, "7A+": 7.0, "7B": 8.0, "7B+": 8.5, "7C": 9.0, "7C+": 10.0,
+    "8A": 11.0, "8A+": 12.0, "8B": 13.0, "8B+": 14.0, "8C": 15.0, "8C+": 16.0,
+    "9A": 17.0,
+}
+
+YDS = "yds"
+BOULDER = "boulder"
+
+
+def yds_value(grade: str | None) -> float | None:
+    if not grade:
+        return None
+    match = YDS_PATTERN.match(grade)
+    if match:
+        number, letters, sign = int(match.group(1)), match.group(2), match.group(3)
+        if number < 10:
+            # No letter grades below 5.10
+            return number + {"+": 0.5, "-": -0.3}.get(sign, 0.0)
+        if letters:
+            # 5.10b/c sits halfway between b and c
+            offsets = [LETTER_OFFSETS[letter.lower()] for letter in re.findall(r"[abcd]", letters, re.IGNORECASE)]
+            return number + sum(offsets) / len(offsets)
+        # 5.10- is roughly a/b, 5.10 b/c and 5.10+ c/d
+        return number + {"+": 0.625, "-": 0.125}.get(sign, 0.375)
+
+    match = CLASS_PATTERN.match(grade)
+    if match:
+        return int(match.group(1)) - 5.0
+    return None
+
+
+def v_value(grade: str | None) -> float | None:
+    if not grade:
+        return None
+    match = V_PATTERN.match(grade)
+    if not match:
+        return None
+    low, high, sign = match.group(1), match.group(2), match.group(3)
+    value = -1.0 if low.upper() == "B" else float(low)
+    if high is not None:
+        # V4-5 sits halfway between
+        return (value + int(high)) / 2
+    return value + {"+": 0.3, "-": -0.3}.get(sign, 0.0)
+
+
+def font_value(grade: str | None) -> float | None:
+    if not grade:
+        return None
+    match = FONT_PATTERN.match(grade)
+    if not match:
+        return None
+    number, letter, plus = match.groups()
+    return FONT_TO_V.get(f"{number}{(letter or '').upper()}{plus or ''}")
+
+
+def grade_values(grade_yds: str | None, grade_font: str | None) -> dict:
+    # OpenBeta puts V grades in the yds field, so boulders can come from either
+    boulder = v_value(grade_yds)
+    if boulder is None:
+        boulder = font_value(grade_font)
+    return {"grade_yds_value": yds_value(grade_yds), "grade_boulder_value": boulder}
+
+
+@event.listens_for(Climb, "before_insert")
+@event.listens_for(Climb, "before_update")
+def _sync_grade_values(mapper, connection, climb: Climb):
+    # ORM writes keep the numeric grades current; bulk inserts set them themselves
+    for column, value in grade_values(climb.grade_yds, climb.grade_font).items():
+        setattr(climb, column, value)
+
+
+def parse_grade(grade: str, upper: bool = False) -> tuple[str, float]:
+    """
+    Parses a grade typed into a filter as (YDS or BOULDER, value). A bare
+    5.10 covers 5.10a through 5.10d, so it means 5.10a as a lower bound and
+    5.10d as an `upper` one. Raises a 400 for anything unrecognizable.
+    """
+    value = yds_value(grade)
+    if value is not None:
+        match = YDS_PATTERN.match(grade)
+        if match and int(match.group(1)) >= 10 and not match.group(2) and not match.group(3):
+            value = int(match.group(1)) + (LETTER_OFFSETS["d"] if upper else LETTER_OFFSETS["a"])
+        return YDS, value
+    value = v_value(grade)
+    if value is None:
+        value = font_value(grade)
+    if value is not None:
+        return BOULDER, value
+    raise HTTPException(status_code=400, detail=f"Unrecognized grade: {grade}")
+
+
+def grade_column(system: str):
+    return Climb.grade_yds_value if system == YDS else Climb.grade_boulder_value
+
+
+def filter_by_grade(query, grade_min: str | None, grade_max: str | None):
+    """
+    Restricts `query` to climbs between two grades of the same system
+    (either bound may be missing). Returns the query and the system used,
+    or None when there is no filter.
+    """
+    bounds = [
+        (bound, parse_grade(grade, upper=bound == "max"))
+        for bound, grade in (("min", grade_min), ("max", grade_max))
+        if grade
+    ]
+    systems = {system for _, (system, _) in bounds}
+    if len(systems) > 1:
+        raise HTTPException(status_code=400, detail="Grade range mixes route and boulder grades")
+    if not systems:
+        return query, None
+
+    system = systems.pop()
+    column = grade_column(system)
+    for bound, (_, value) in bounds:
+        query = query.filter(column >= value if bound == "min" else column <= value)
+    return query, system
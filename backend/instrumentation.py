@@ -0,0 +1,205 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# A statement shape run more often than this in one request is flagged as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+# Keep per-route totals for the /internal/queries report (development)
+QUERY_REPORT = os.getenv("QUERY_REPORT", "").lower() in ("1", "true", "yes")
+
+
+class QueryStats:
+    """
+    Statements executed while this object is current. Shapes are the SQL
+    text SQLAlchemy sends, which has placeholders instead of values, so the
+    same lazy load for different rows counts as one shape.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.shapes[" ".join(statement.split())] += 1
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> list[tuple[str, int]]:
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+# Process-wide collectors (see max_queries), which see statements from every
+# thread; a test client runs the app on a thread of its own
+_collectors: list[QueryStats] = []
+_collectors_lock = threading.Lock()
+
+
+def _active() -> list[QueryStats]:
+    stats = _current.get()
+    active = [stats] if stats is not None else []
+    if _collectors:
+        with _collectors_lock:
+            active.extend(_collectors)
+    return active
+
+
+# Registered on the Engine class so the sync engine, the async engine's sync
+# core and any script engine are all covered. Context variables follow the
+# request into threadpool calls and run_sync greenlets.
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None or _collectors:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    duration = time.perf_counter() - started.pop()
+    for stats in _active():
+        stats.record(statement, duration)
+
+
+@event.listens_for(Engine, "handle_error")
+def _record_failed_statement(exception_context):
+    # after_cursor_execute doesn't run for a failed statement; without this
+    # its start time would stay on the pooled connection for good
+    conn = exception_context.connection
+    started = conn.info.get("query_started") if conn is not None else None
+    if not started or exception_context.statement is None:
+        return
+    duration = time.perf_counter() - started.pop()
+    for stats in _active():
+        stats.record(exception_context.statement, duration)
+
+
+@contextmanager
+def track_queries():
+    # Collects every statement run in this context (and the threads and
+    # greenlets it hands off to) into a fresh QueryStats
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def max_queries(limit: int):
+    """
+    Test helper: fails if more than `limit` statements run anywhere in the
+    process during the block, e.g. for one request through a TestClient:
+
+        with max_queries(6):
+            client.get("/")
+    """
+    stats = QueryStats()
+    with _collectors_lock:
+        _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _collectors.remove(stats)
+    if stats.count > limit:
+        shapes = "\n".join(f"  {count}x {shape}" for shape, count in stats.shapes.most_common(5))
+        raise AssertionError(f"{stats.count} queries, expected at most {limit}:\n{shapes}")
+
+
+class RouteReport:
+    # Per-route totals across requests, for finding the worst offenders
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def add(self, route: str, stats: QueryStats):
+        repeated = stats.repeated()
+        with self._lock:
+            totals = self.routes.setdefault(route, {
+                "requests": 0, "queries": 0, "max_queries": 0, "db_ms": 0.0, "n_plus_one": Counter(),
+            })
+            totals["requests"] += 1
+            totals["queries"] += stats.count
+            totals["max_queries"] = max(totals["max_queries"], stats.count)
+            totals["db_ms"] += stats.duration * 1000
+            for shape, count in repeated:
+                totals["n_plus_one"][shape] = max(totals["n_plus_one"][shape], count)
+
+    def worst(self, limit: int = 20) -> list[dict]:
+        with self._lock:
+            rows = [
+                {
+                    "route": route,
+                    "requests": totals["requests"],
+                    "avg_queries": round(totals["queries"] / totals["requests"], 2),
+                    "max_queries": totals["max_queries"],
+                    "avg_db_ms": round(totals["db_ms"] / totals["requests"], 3),
+                    "n_plus_one": [
+                        {"statement": shape, "max_per_request": count}
+                        for shape, count in totals["n_plus_one"].most_common(5)
+                    ],
+                }
+                for route, totals in self.routes.items()
+            ]
+        rows.sort(key=lambda row: (row["avg_queries"], row["avg_db_ms"]), reverse=True)
+        return rows[:limit]
+
+    def clear(self):
+        with self._lock:
+            self.routes.clear()
+
+
+report = RouteReport()
+
+
+class QueryStatsMiddleware:
+    """
+    Pure ASGI middleware that counts and times the SQL each HTTP request runs.
+    The totals go out in a Server-Timing header (db time and query count,
+    plus the time until the response started) and repeated statement shapes
+    are logged as likely N+1 queries.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with track_queries() as stats:
+            async def send_with_timing(message: Message):
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", (
+                        f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+                        f"app;dur={(time.perf_counter() - started) * 1000:.1f}"
+                    ))
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+        route = getattr(scope.get("route"), "path", scope["path"])
+        for shape, count in stats.repeated():
+            logger.warning("Possible N+1 on %s %s: %d x %s", scope["method"], route, count, shape)
+        if QUERY_REPORT:
+            report.add(f"{scope['method']} {route}", stats)
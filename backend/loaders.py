@@ -0,0 +1,50 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from models import FeedItem, User, UserAssociation, UserInterest
+
+# Named loader strategies: each page loads everything its template touches
+# up front, so it renders in a fixed number of queries however many rows it
+# shows. Collections use selectinload (one extra query per collection, no
+# row duplication) and many-to-ones joinedload.
+
+# Raise instead of lazy loading, to catch pages that miss a profile (tests, development)
+RAISE_ON_LAZY_LOAD = os.getenv("RAISE_ON_LAZY_LOAD", "").lower() in ("1", "true", "yes")
+
+# Users that are only rendered as a linked name
+USER_LINK = (User.id, User.name)
+
+# Feed cards show their author
+FEED_CARD = (
+    joinedload(FeedItem.user).load_only(*USER_LINK),
+)
+
+# Who a user follows and who follows them
+FOLLOWS = (
+    selectinload(User.following).joinedload(UserAssociation.friend).load_only(*USER_LINK),
+    selectinload(User.followers).joinedload(UserAssociation.user).load_only(*USER_LINK),
+)
+
+# The climbs a user is projecting
+PROJECTS = (
+    selectinload(User.interests).joinedload(UserInterest.climb),
+)
+
+DASHBOARD = FOLLOWS + PROJECTS
+USER_PROFILE = FOLLOWS + PROJECTS
+
+# Climb pages list the users projecting the climb
+CLIMB_DETAILS = (
+    load_only(*USER_LINK),
+)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _raise_on_lazy_load(orm_execute_state):
+    # lazy_loaded_from is only set for lazy loads, not for selectin/subquery eager loads
+    if RAISE_ON_LAZY_LOAD and orm_execute_state.is_select and orm_execute_state.lazy_loaded_from is not None:
+        state = orm_execute_state.lazy_loaded_from
+        raise InvalidRequestError(
+            f"Lazy load from {state.class_.__name__} {state.identity}; add the relationship to a loader profile in loaders.py"
+        )
@@ -1,117 +1,136 @@
-from fastapi import FastAPI, Depends, HTTPException
-from jose import JWTError
+from fastapi import FastAPI, Depends, HTTPException, Query
 from datetime import datetime
 from typing import Optional
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordBearer
-from fastapi.templating import Jinja2Templates
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from database import AsyncSessionLocal, SessionLocal, async_engine, engine, init_db
 from models import Notification, User
 from pydantic import BaseModel
 from fastapi import FastAPI, Request, Form, Depends
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from auth import verify_password, create_access_token, hash_password, decode_access_token
+from auth import create_access_token
+from passwords import passwords
+from principal import resolve_principal, forget_token, token_from_request
+from counters import add_notification, decrement_unread, increment_followers
+from timeline import publish, backfill, read_timeline, timeline_key
+from pagination import PAGE_SIZE, decode_cursor, page_of, paginate
+from queries import shared_interests_for
+from area_tree import add_area_closure, subtree_climbs
+from area_index import get_area_index, find_area, invalidate_area_index
+from versions import AREAS, bump_row_versions, bump_version
+from response_cache import response_cache
+from templating import templates
+from etags import not_modified, page_etag, with_validators
+from search import search_areas, search_climbs
+from geo import nearby_climbs
+from grades import YDS, filter_by_grade, grade_column
+from urllib.parse import urlencode
 from models import User, Climb, UserInterest, FeedItem, Area, UserAssociation
+import os
+import secrets
 import uuid
+from contextlib import asynccontextmanager
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from middleware import SessionMiddleware
+from pool_stats import pool_status
+from loaders import CLIMB_DETAILS, DASHBOARD, USER_PROFILE
+from instrumentation import N_PLUS_ONE_THRESHOLD, QUERY_REPORT, QueryStatsMiddleware, report
 
-app = FastAPI()
+# Shared secret for the /internal endpoints, sent as X-Internal-Token; they
+# are disabled when it isn't set
+INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN")
 
 
-templates = Jinja2Templates(directory="templates")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    templates.warm()
+    passwords.start()
+    yield
+    passwords.shutdown()
+    await response_cache.backend.close()
+    await async_engine.dispose()
+    engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+
+def render_content(name: str, context: dict) -> str:
+    # Renders only the page's content block, which must not depend on the viewer
+    template = templates.get_template(name)
+    return "".join(template.blocks["content"](template.new_context(context)))
+
+
+def cached_page(request: Request, content, message: str | None = None):
+    # Wraps a (cached) content fragment in the per-viewer layout
+    return templates.TemplateResponse("cached_page.html", {"request": request, "content": content, "message": message})
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_db():
+def get_db(request: Request):
+    # Share the session SessionMiddleware opened for this request; it closes it
+    db = getattr(request.state, "db", None)
+    if db is not None:
+        yield db
+        return
+
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    # Read-heavy routes run on the event loop with their own AsyncSession
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     """
     Retrieves the current user from the request by decoding the access token.
-    This function will return the user object if the token is valid, otherwise None.
+    Raises a 401 if the request does not carry a valid token for a known user.
     """
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-
-    # Decode the token (ensure your token decoding function is correct)
-    token = token.replace("Bearer ", "")
-    try:
-        payload = decode_access_token(token)
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    # Get user info from the token's payload (this assumes 'sub' is the email)
-    email = payload.get("sub")
-    if not email:
-        raise HTTPException(status_code=401, detail="Invalid token payload")
-
-    # Fetch the user from the database using the email
-    user = db.query(User).filter(User.email == email).first()
+    user = resolve_principal(request, db)
     if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+        raise HTTPException(status_code=401, detail="Not authenticated")
     return user
 
-class NotificationMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        db: Session = next(get_db())
+app.add_middleware(SessionMiddleware)
+# Added last so it wraps SessionMiddleware and counts principal lookups too
+app.add_middleware(QueryStatsMiddleware)
 
-        # Try to get the current user from the request
-        current_user = None
-        try:
-            current_user = get_current_user(request, db=db)
-        except HTTPException:
-            current_user = None  # If no user is found, set it to None (i.e., user not authenticated)
-
-        # Add the current user to the request state
-        request.state.current_user = current_user
-
-        # Handle unread notifications count for the current user
-        unread_notifications_count = 0
-        if current_user:
-            unread_notifications_count = db.query(Notification).filter(
-                Notification.user_id == current_user.id, Notification.read == False
-            ).count()
-
-        # Add unread notifications count to request state
-        request.state.unread_notifications_count = unread_notifications_count
-
-        # Proceed with the request
-        response = await call_next(request)
-        return response
+# Dependency to get the database session
 
-app.add_middleware(NotificationMiddleware)
 
-# Dependency to get the database session
 
+def require_internal(request: Request):
+    token = request.headers.get("x-internal-token")
+    if not INTERNAL_TOKEN or not token or not secrets.compare_digest(token, INTERNAL_TOKEN):
+        raise HTTPException(status_code=404, detail="Not Found")
 
 
 def protect_route(request: Request, db: Session = Depends(get_db)):
-    # Get the token from cookies
-    token = request.cookies.get("access_token")
-    if not token:
+    # The middleware has already resolved the user for this request
+    user = getattr(request.state, "current_user", None)
+    if not user:
         return None
 
+    if user not in db:
+        user = db.merge(user, load=False)
+    return user
 
-    # Decode the token
-    token = token.replace("Bearer ", "")
-    payload = decode_access_token(token)
-    if not payload:
-        return None
-    # Get the current user
-    email = payload.get("sub")
-    user = db.query(User).filter(User.email == email).first()
+
+async def protect_route_async(request: Request, db: AsyncSession):
+    # protect_route for async routes: attach the resolved user without a SELECT
+    user = getattr(request.state, "current_user", None)
     if not user:
         return None
-
-    return user
+    return await db.merge(user, load=False)
 
 
 @app.get("/login", response_class=HTMLResponse)
@@ -125,18 +144,17 @@ class RegisterUser(BaseModel):
     password: str
 
 @app.post("/register")
-def register_user(user: RegisterUser, db: Session = Depends(get_db)):
+async def register_user(user: RegisterUser, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = (await db.scalars(select(User.id).where(User.email == user.email))).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    # Hash the password and save the user
-    hashed_password = hash_password(user.password)
+    # Hash the password (in the password pool) and save the user
+    hashed_password = await passwords.hash(user.password)
     new_user = User(name=user.name, email=user.email, password_hash=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
 
     return {"message": "User registered successfully", "user_id": new_user.id}
 
@@ -145,20 +163,27 @@ class LoginUser(BaseModel):
     password: str
 
 @app.post("/login")
-def login_user(
+async def login_user(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Find user in database
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.password_hash):
+    user = (await db.scalars(select(User).where(User.email == email))).first()
+    valid = False
+    if user:
+        valid, new_hash = await passwords.verify(password, user.password_hash)
+    if not valid:
         # Return the login page with an error
         return templates.TemplateResponse(
             "login.html",
             {"request": request, "error": "Invalid email or password"}
         )
+    if new_hash:
+        # Stored with an outdated cost factor; upgrade it while we have the password
+        user.password_hash = new_hash
+        await db.commit()
     # Generate JWT token
     access_token = create_access_token(data={"sub": user.email})
     response = RedirectResponse(url="/", status_code=302)
@@ -167,35 +192,23 @@ def login_user(
 
 
 @app.get("/", response_class=HTMLResponse)
-def dashboard(request: Request, db: Session = Depends(get_db), message: str | None = None):
-    current_user = protect_route(request, db)
+async def dashboard(request: Request, db: AsyncSession = Depends(get_async_db), message: str | None = None):
+    current_user = await protect_route_async(request, db)
     if not current_user:
         return RedirectResponse(url="/login")
 
-    following = [a.friend for a in current_user.following]
-    followers = [a.user for a in current_user.followers]
-
-    following_ids = [friend.id for friend in following]
-    relevant_user_ids = [current_user.id] + following_ids
+    # Reload the principal with everything the page renders
+    current_user = (await db.scalars(
+        select(User).options(*DASHBOARD).where(User.id == current_user.id)
+    )).one()
+    following = [association.friend for association in current_user.following]
+    followers = [association.user for association in current_user.followers]
 
-    feed_items = db.query(FeedItem).filter(
-        FeedItem.user_id.in_(relevant_user_ids)
-    ).order_by(FeedItem.timestamp.desc()).limit(5)
+    feed_items = await db.run_sync(read_timeline, current_user.id, limit=5)
 
     climbs_of_interest = [interest.climb for interest in current_user.interests]
 
-
-    user_climbs = db.query(Climb).join(UserInterest).filter(UserInterest.user_id == current_user.id).all()
-
-    shared_interests = {}
-    for climb in user_climbs:
-        friends_with_interest = (
-            db.query(User)
-            .join(UserInterest)
-           .filter(UserInterest.climb_id == climb.id, User.id.in_([friend.id for friend in following]))
-            .all()
-        )
-        shared_interests[climb] = friends_with_interest
+    shared_interests = await db.run_sync(shared_interests_for, current_user.id)
 
     return templates.TemplateResponse(
         "dashboard.html",
@@ -213,7 +226,8 @@ def dashboard(request: Request, db: Session = Depends(get_db), message: str | No
  
 
 @app.post("/logout")
-def logout():
+def logout(request: Request):
+    forget_token(token_from_request(request))
     response = RedirectResponse(url="/login", status_code=302)
     response.delete_cookie(key="access_token")
     return response
@@ -221,19 +235,26 @@ def logout():
 
 
 @app.get("/users", response_class=HTMLResponse)
-def list_users(request: Request, db: Session = Depends(get_db), message: str | None = None):
+def list_users(request: Request, db: Session = Depends(get_db), message: str | None = None, after: str | None = None):
     # Use protect_route to get the authenticated user
     current_user = protect_route(request, db)
     if not current_user:
         return RedirectResponse(url="/login")
 
     # Fetch all users except the authenticated user and their friends
-    friends_ids = [friend.friend_id for friend in current_user.following]
-    users = db.query(User).filter(User.id.notin_([current_user.id] + friends_ids)).all()
+    friends_ids = select(UserAssociation.friend_id).where(UserAssociation.user_id == current_user.id)
+    page = paginate(
+        db.query(User).filter(User.id != current_user.id, User.id.notin_(friends_ids)),
+        [User.id],
+        lambda user: (user.id,),
+        decode_cursor(after, int),
+        descending=False,
+    )
 
-    return templates.TemplateResponse("users.html", {
+    return templates.StreamingTemplateResponse("users.html", {
         "request": request,
-        "users": users,
+        "users": page.items,
+        "next_cursor": page.next_cursor,
         "current_user": current_user ,
         "message": message
     })
@@ -279,6 +300,10 @@ def add_friend_users(
         followed_at=datetime.utcnow()  
     )
     db.add(new_follow)
+    increment_followers(db, friend_id)
+    # Both profiles list the follow
+    bump_row_versions(db, User, User.id.in_([current_user.id, friend_id]))
+    backfill(db, current_user.id, friend_id)
 
     notification = Notification(
         user_id=friend_id,
@@ -287,7 +312,7 @@ def add_friend_users(
         read=False,
         notification_type="follow"
     )
-    db.add(notification)
+    add_notification(db, notification)
     db.commit()
 
     feed_item = FeedItem(
@@ -295,32 +320,103 @@ def add_friend_users(
         action="followed",
         details=f"followed {friend.name}"
     )
-    db.add(feed_item)
+    publish(db, feed_item)
     db.commit()
 
     return RedirectResponse(url=f"/users?message=Successfully added {friend.name} as a friend.", status_code=302)
 
 
+CLIMB_SORTS = ("name", "grade", "-grade")
+
+
+def climb_listing(query, after: str | None, grade_min: str | None, grade_max: str | None, sort: str):
+    """
+    One page of a climb listing, filtered to a grade range and ordered by
+    name or grade. Grade sorts use whichever system the range is in (YDS if
+    there is none) and skip climbs without a grade in it.
+    """
+    if sort not in CLIMB_SORTS:
+        raise HTTPException(status_code=400, detail="Invalid sort")
+    query, system = filter_by_grade(query, grade_min, grade_max)
+    filters = urlencode({
+        key: value
+        for key, value in (("grade_min", grade_min), ("grade_max", grade_max), ("sort", sort))
+        if value and value != "name"
+    })
+
+    if sort == "name":
+        page = paginate(
+            query,
+            [Climb.name, Climb.id],
+            lambda climb: (climb.name, climb.id),
+            decode_cursor(after, str, str),
+            descending=False,
+        )
+        return page, filters
+
+    column = grade_column(system or YDS)
+    page = paginate(
+        query.filter(column.isnot(None)),
+        [column, Climb.name, Climb.id],
+        lambda climb: (getattr(climb, column.key), climb.name, climb.id),
+        decode_cursor(after, float, str, str),
+        descending=sort == "-grade",
+    )
+    return page, filters
+
+
 @app.get("/climbs", response_class=HTMLResponse)
-def list_climbs(request: Request, db: Session = Depends(get_db), message: str | None= None):
+def list_climbs(request: Request, db: Session = Depends(get_db), message: str | None= None, after: str | None = None,
+                grade_min: str | None = None, grade_max: str | None = None, sort: str = "name"):
 
     current_user = protect_route(request, db)
     if not current_user:
         return RedirectResponse(url="/login")
  
-    # Fetch all climbs
-    climbs = db.query(Climb).all()
+    # Fetch one page of climbs, alphabetically or by grade
+    page, filters = climb_listing(db.query(Climb), after, grade_min, grade_max, sort)
     # Fetch user interests
-    user_interests = {interest.climb_id for interest in current_user.interests}
+    user_interests = {climb_id for (climb_id,) in db.query(UserInterest.climb_id).filter(UserInterest.user_id == current_user.id)}
 
-    return templates.TemplateResponse("areas.html", {
+    return templates.StreamingTemplateResponse("climbs.html", {
         "request": request,
-        "climbs": climbs,
+        "title": "Climbs",
+        "list_url": "/climbs",
+        "climbs": page.items,
+        "next_cursor": page.next_cursor,
+        "filters": filters,
+        "grade_min": grade_min,
+        "grade_max": grade_max,
+        "sort": sort,
         "message": message,
         "user_interests": user_interests,
         "current_user": current_user
     })
 
+@app.get("/climbs/nearby")
+def list_nearby_climbs(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(10, gt=0, le=500),  # km
+    k: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    nearest = nearby_climbs(db, lat, lng, radius, k)
+    return {
+        "climbs": [
+            {
+                "id": climb.id,
+                "name": climb.name,
+                "grade_yds": climb.grade_yds,
+                "area_id": climb.area_id,
+                "latitude": climb.latitude,
+                "longitude": climb.longitude,
+                "distance_km": round(distance, 3),
+            }
+            for climb, distance in nearest
+        ]
+    }
+
 @app.post("/climbs/{climb_id}/interest")
 def add_interest(climb_id: str, request: Request, db: Session = Depends(get_db)):
 
@@ -334,15 +430,21 @@ def add_interest(climb_id: str, request: Request, db: Session = Depends(get_db))
         raise HTTPException(status_code=404, detail="Climb not found")
 
     # Add interest if not already present
-    if not any(interest.climb_id == climb_id for interest in current_user.interests):
+    already_interested = db.query(UserInterest.id).filter(
+        UserInterest.user_id == current_user.id, UserInterest.climb_id == climb_id
+    ).first()
+    if not already_interested:
         new_interest = UserInterest(user_id=current_user.id, climb_id=climb_id)
         feed_item = FeedItem(
                 user_id=current_user.id,
                 action="new_interest_climb",
                 details=f"Started Projecting {climb.name}"
         )
-        db.add(feed_item)
+        publish(db, feed_item)
         db.add(new_interest)
+        # The climb page lists who is projecting it, the profile what they project
+        bump_row_versions(db, Climb, Climb.id == climb_id)
+        bump_row_versions(db, User, User.id == current_user.id)
         db.commit()
 
 
@@ -379,10 +481,12 @@ def remove_interest(
                 action="completed_climb",
                 details=f"Sent {climb.name}"
             )
-            db.add(feed_item)
+            publish(db, feed_item)
 
         # Remove the interest
         db.delete(interest)
+        bump_row_versions(db, Climb, Climb.id == climb_id)
+        bump_row_versions(db, User, User.id == current_user.id)
         db.commit()
 
     # Redirect to /me with a success message
@@ -393,26 +497,22 @@ def remove_interest(
     return response
 
 @app.get("/feed", response_class=HTMLResponse)
-def user_feed(request: Request, db: Session = Depends(get_db)):
+async def user_feed(request: Request, db: AsyncSession = Depends(get_async_db), before: str | None = None):
 
-    current_user = protect_route(request, db)
+    current_user = await protect_route_async(request, db)
     if not current_user:
         return RedirectResponse(url="/login")
 
 
-    following = [a.friend for a in current_user.following]
-
-    following_ids = [friend.id for friend in following]
-    relevant_user_ids = [current_user.id] + following_ids
+    # Fetch one page of feed items for the user and their friends
+    cursor = decode_cursor(before, datetime, int)
+    feed_items = await db.run_sync(read_timeline, current_user.id, limit=PAGE_SIZE + 1, before=cursor)
+    page = page_of(feed_items, PAGE_SIZE, timeline_key)
 
-    # Fetch feed items for the user and their friends
-    feed_items = db.query(FeedItem).filter(
-        FeedItem.user_id.in_(relevant_user_ids)
-    ).order_by(FeedItem.timestamp.desc()).all()
-
-    return templates.TemplateResponse("feed.html", {
+    return templates.StreamingTemplateResponse("feed.html", {
         "request": request,
-        "feed_items": feed_items,
+        "feed_items": page.items,
+        "next_cursor": page.next_cursor,
         "current_user": current_user
     })
 
@@ -423,20 +523,9 @@ def shared_interests(request: Request, db: Session = Depends(get_db)):
         return RedirectResponse(url="/login")
 
 
-    user_climbs = db.query(Climb).join(UserInterest).filter(UserInterest.user_id == current_user.id).all()
-
-
-    shared_interests = {}
-    for climb in user_climbs:
-        friends_with_interest = (
-            db.query(User)
-            .join(UserInterest)
-            .filter(UserInterest.climb_id == climb.id, User.id.in_([friend.id for friend in current_user.following]))
-            .all()
-        )
-        shared_interests[climb] = friends_with_interest
+    shared_interests = shared_interests_for(db, current_user.id)
 
-    return templates.TemplateResponse("shared_interests.html", {
+    return templates.StreamingTemplateResponse("shared_interests.html", {
         "request": request,
         "current_user": current_user,
         "shared_interests": shared_interests,
@@ -448,69 +537,128 @@ def signup_form(request: Request):
 
 
 @app.post("/signup")
-def signup(
+async def signup(
     name: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = (await db.scalars(select(User.id).where(User.email == email))).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Create new user
-    hashed_password = hash_password(password)
+    hashed_password = await passwords.hash(password)
     new_user = User(name=name, email=email, password_hash=hashed_password)
     db.add(new_user)
-    db.commit()
+    await db.commit()
 
     # Redirect to login page with success message
     return RedirectResponse(url="/login?message=Account created successfully. Please log in.", status_code=302)
 
 
 @app.get("/areas", response_class=HTMLResponse)
-def get_areas_page(request: Request, db: Session = Depends(get_db), message: str | None=None):
-    areas = db.query(Area).filter(Area.parent_id == None).all()  # Get root areas
-    return templates.TemplateResponse("areas.html", {"request": request, "areas": areas, "message": message})
+async def get_areas_page(request: Request, db: AsyncSession = Depends(get_async_db), message: str | None=None):
+    index = await db.run_sync(get_area_index)
+
+    async def render():
+        return render_content("areas.html", {"areas": index.roots})  # root areas
+
+    # The tree only changes together with the "areas" stamp
+    content = await response_cache.fragment("areas", "all", index.version, render)
+    return cached_page(request, content, message)
 
 @app.get("/area/{area_id}", response_class=HTMLResponse)
-def get_area_details(request: Request, area_id: str, db: Session = Depends(get_db),message: str|None=None):
-    # Fetch the selected area by ID
-    area = db.query(Area).filter(Area.id == area_id).first()
+async def get_area_details(request: Request, area_id: str, db: AsyncSession = Depends(get_async_db),message: str|None=None):
+    # Fetch the selected area from the in-memory area tree
+    area = await db.run_sync(find_area, area_id)
     if not area:
         raise HTTPException(status_code=404, detail="Area not found")
 
-    # Fetch the children of this area
-    children = db.query(Area).filter(Area.parent_id == area_id).all()
+    etag = page_etag(request, "area", area.id, area.version)
+    unchanged = not_modified(request, etag, area.updated_at)
+    if unchanged:
+        return unchanged
+
+    async def render():
+        # Fetch the children of this area
+        children = area.children
+
+        # Fetch parent areas (to create breadcrumb)
+        breadcrumb = (await db.run_sync(get_area_index)).ancestors(area.id)
+
+        # Fetch climbs for this area if it has no children
+        climbs = []
+        if not children:
+            climbs = (await db.scalars(select(Climb).where(Climb.area_id == area_id))).all()
+
+        return render_content("area_details.html", {
+            "area": area,
+            "children": children,
+            "climbs": climbs,
+            "breadcrumb": breadcrumb
+        })
 
-    # Fetch parent areas (to create breadcrumb)
-    breadcrumb = []
-    parent = area
-    while parent:
-        breadcrumb.insert(0, parent)  # Insert at the beginning of the list
-        parent = db.query(Area).filter(Area.id == parent.parent_id).first()
+    content = await response_cache.fragment("area", area.id, area.version, render)
+    return with_validators(cached_page(request, content, message), etag, area.updated_at)
 
-    # Fetch climbs for this area if it has no children
-    climbs = []
-    if not children:
-        climbs = db.query(Climb).filter(Climb.area_id == area_id).all()
 
-    # Pass the area, its children, and climbs to the template
-    return templates.TemplateResponse("area_details.html", {
+@app.get("/area/{area_id}/climbs", response_class=HTMLResponse)
+def list_area_climbs(request: Request, area_id: str, db: Session = Depends(get_db), after: str | None = None,
+                     grade_min: str | None = None, grade_max: str | None = None, sort: str = "name"):
+    area = find_area(db, area_id)
+    if not area:
+        raise HTTPException(status_code=404, detail="Area not found")
+
+    # Every climb anywhere under this area, alphabetically or by grade
+    page, filters = climb_listing(subtree_climbs(db, area.id), after, grade_min, grade_max, sort)
+    user_interests = set()
+    current_user = request.state.current_user
+    if current_user:
+        user_interests = {climb_id for (climb_id,) in db.query(UserInterest.climb_id).filter(UserInterest.user_id == current_user.id)}
+
+    return templates.StreamingTemplateResponse("climbs.html", {
         "request": request,
-        "area": area,
-        "message": message,
-        "children": children,
+        "title": f"Climbs in {area.name}",
+        "list_url": f"/area/{area.id}/climbs",
+        "climbs": page.items,
+        "next_cursor": page.next_cursor,
+        "filters": filters,
+        "grade_min": grade_min,
+        "grade_max": grade_max,
+        "sort": sort,
+        "user_interests": user_interests,
+    })
+
+
+@app.get("/search", response_class=HTMLResponse)
+def search(request: Request, db: Session = Depends(get_db), q: str = "", page: int = 1):
+    q = q.strip()
+    page = max(page, 1)
+    climbs, areas, has_next = [], [], False
+    if q:
+        # Ranked, so pages are by offset; fetch one extra to know if there's another
+        climbs = search_climbs(db, q, limit=PAGE_SIZE + 1, offset=(page - 1) * PAGE_SIZE)
+        has_next = len(climbs) > PAGE_SIZE
+        climbs = climbs[:PAGE_SIZE]
+        if page == 1:
+            areas = search_areas(db, q, limit=10)
+
+    return templates.StreamingTemplateResponse("search.html", {
+        "request": request,
+        "q": q,
+        "page": page,
         "climbs": climbs,
-        "breadcrumb": breadcrumb
+        "areas": areas,
+        "has_next": has_next,
     })
 
 
 @app.get("/area/{area_id}/add-climb", response_class=HTMLResponse)
 def get_add_climb_form(area_id: str, request: Request, db: Session = Depends(get_db)):
     # Fetch the area by ID
-    area = db.query(Area).filter(Area.id == area_id).first()
+    area = find_area(db, area_id)
     if not area:
         raise HTTPException(status_code=404, detail="Area not found")
 
@@ -553,9 +701,12 @@ def add_climb(area_id: str,
         longitude=parsed_longitude
     )
     
-    # Add the climb to the session and commit
+    # Add the climb to the session and commit; climb counts live in the area index
     db.add(new_climb)
+    bump_row_versions(db, Area, Area.id == area.id)
+    bump_version(db, AREAS)
     db.commit()
+    invalidate_area_index()
     
     # Redirect to the area page
     return RedirectResponse(url=f"/area/{area_id}", status_code=303)
@@ -565,7 +716,7 @@ def add_climb(area_id: str,
 @app.get("/area/{area_id}/add-area", response_class=HTMLResponse)
 def get_add_area_form(area_id: str, request: Request, db: Session = Depends(get_db)):
     # Fetch the parent area by ID
-    parent_area = db.query(Area).filter(Area.id == area_id).first()
+    parent_area = find_area(db, area_id)
     if not parent_area:
         raise HTTPException(status_code=404, detail="Parent Area not found")
 
@@ -600,28 +751,44 @@ def add_area(area_id: str,
 
     # Add the new area to the session and commit
     db.add(new_area)
+    db.flush()
+    add_area_closure(db, new_area.id, parent_area.id)
+    bump_row_versions(db, Area, Area.id == parent_area.id)
+    bump_version(db, AREAS)
     db.commit()
+    invalidate_area_index()
 
     # Redirect to the parent area page
     return RedirectResponse(url=f"/area/{parent_area.id}", status_code=303)
 
 
 @app.get("/notifications", response_class=HTMLResponse)
-def notifications(request: Request, db: Session = Depends(get_db), message: str | None=None):
+async def notifications(request: Request, db: AsyncSession = Depends(get_async_db), message: str | None=None, before: str | None = None):
     # Protect the route and ensure the user is logged in
-    current_user = protect_route(request, db)
+    current_user = await protect_route_async(request, db)
     if not current_user:
         return RedirectResponse(url="/login")
 
-    # Fetch notifications for the current user
-    notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id
-    ).order_by(Notification.timestamp.desc()).all()
-
-    return templates.TemplateResponse("notifications.html", {
+    # Fetch one page of notifications for the current user
+    cursor = decode_cursor(before, datetime, int)
+    page = await db.run_sync(lambda sync_db: paginate(
+        sync_db.query(Notification).filter(Notification.user_id == current_user.id),
+        [Notification.timestamp, Notification.id],
+        lambda notification: (notification.timestamp, notification.id),
+        cursor,
+    ))
+
+    # For the follow-back buttons
+    following_ids = set((await db.scalars(
+        select(UserAssociation.friend_id).where(UserAssociation.user_id == current_user.id)
+    )).all())
+
+    return templates.StreamingTemplateResponse("notifications.html", {
         "request": request,
         "current_user": current_user,
-        "notifications": notifications,
+        "notifications": page.items,
+        "next_cursor": page.next_cursor,
+        "following_ids": following_ids,
         "message":message
     })
 
@@ -639,9 +806,11 @@ def mark_notification_as_read(notification_id: int, db: Session = Depends(get_db
     if notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="You cannot mark this notification as read")
 
-    # Mark the notification as read
-    notification.read = True
-    db.commit()
+    # Mark the notification as read, keeping the unread counter in step
+    if not notification.read:
+        notification.read = True
+        decrement_unread(db, current_user.id)
+        db.commit()
 
     return RedirectResponse(url="/notifications", status_code=302)
 
@@ -683,6 +852,10 @@ def add_friend(
         followed_at=datetime.utcnow()  
     )
     db.add(new_follow)
+    increment_followers(db, friend_id)
+    # Both profiles list the follow
+    bump_row_versions(db, User, User.id.in_([current_user.id, friend_id]))
+    backfill(db, current_user.id, friend_id)
 
     # Create a follow notification for the followed user
     notification = Notification(
@@ -692,7 +865,7 @@ def add_friend(
         read=False,
         notification_type="follow"
     )
-    db.add(notification)
+    add_notification(db, notification)
     db.commit()
 
     # Optionally, create a feed item for the current user (showing who they followed)
@@ -701,56 +874,108 @@ def add_friend(
         action="followed",
         details=f"followed {friend.name}"
     )
-    db.add(feed_item)
+    publish(db, feed_item)
     db.commit()
 
     return RedirectResponse(url=f"/notifications?message=Successfully added {friend.name} as a friend.", status_code=302)
 
 @app.get("/users/{user_id}", response_class=HTMLResponse)
 def user_profile(request: Request, user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    # Check the client's copy against the version before loading the whole profile
+    stamp = db.query(User.version, User.updated_at).filter(User.id == user_id).first()
+    if not stamp:
         raise HTTPException(status_code=404, detail="User not found")
+    etag = page_etag(request, "user", user_id, stamp.version)
+    unchanged = not_modified(request, etag, stamp.updated_at)
+    if unchanged:
+        return unchanged
 
-    user_climbs = db.query(Climb).join(UserInterest).filter(UserInterest.user_id == user.id).all()
+    user = db.query(User).options(*USER_PROFILE).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
-    following = db.query(User).join(UserAssociation, UserAssociation.user_id == User.id).filter(UserAssociation.user_id == user.id).all()
-    followers = db.query(User).join(UserAssociation, UserAssociation.friend_id == User.id).filter(UserAssociation.friend_id == user.id).all()
+    user_climbs = [interest.climb for interest in user.interests]
+    following = [association.friend for association in user.following]
+    followers = [association.user for association in user.followers]
 
+    current_user = protect_route(request, db)
+    is_following = current_user is not None and any(
+        association.user_id == current_user.id for association in user.followers
+    )
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "user_profile.html",
         {
             "request": request,
             "user": user,
             "user_climbs": user_climbs,
             "following": following,
-            "followers": followers
+            "followers": followers,
+            "is_following": is_following,
         }
     )
+    return with_validators(response, etag, stamp.updated_at)
 
 
 @app.get("/climb/{climb_id}", response_class=HTMLResponse)
-def get_climb_details(request: Request, climb_id: str, db: Session = Depends(get_db)):
+async def get_climb_details(request: Request, climb_id: str, db: AsyncSession = Depends(get_async_db)):
     # Fetch the climb by its ID
-    climb = db.query(Climb).filter(Climb.id == climb_id).first()
+    climb = await db.get(Climb, climb_id)
     if not climb:
         raise HTTPException(status_code=404, detail="Climb not found")
 
-    # Fetch users who have this climb as a project (i.e., in their UserInterest)
-    users_with_interest = db.query(User).join(UserInterest).filter(UserInterest.climb_id == climb.id).all()
-
-    breadcrumb = []
-    parent = climb.area
-    while parent:
-        breadcrumb.insert(0, parent)  # Insert at the beginning of the list
-        parent = db.query(Area).filter(Area.id == parent.parent_id).first()
-
-
-
-    return templates.TemplateResponse("climb_details.html", {
-        "request": request,
-        "climb": climb,
-        "users_with_interest": users_with_interest,
-        "breadcrumb" : breadcrumb
-    })
+    etag = page_etag(request, "climb", climb.id, climb.version)
+    unchanged = not_modified(request, etag, climb.updated_at)
+    if unchanged:
+        return unchanged
+
+    async def render():
+        # Fetch users who have this climb as a project (i.e., in their UserInterest)
+        users_with_interest = (await db.scalars(
+            select(User).options(*CLIMB_DETAILS).join(UserInterest).where(UserInterest.climb_id == climb.id)
+        )).all()
+
+        breadcrumb = (await db.run_sync(get_area_index)).ancestors(climb.area_id)
+
+        return render_content("climb_details.html", {
+            "climb": climb,
+            "users_with_interest": users_with_interest,
+            "breadcrumb" : breadcrumb
+        })
+
+    content = await response_cache.fragment("climb", climb.id, climb.version, render)
+    return with_validators(cached_page(request, content), etag, climb.updated_at)
+
+
+@app.get("/internal/pool", dependencies=[Depends(require_internal)])
+def internal_pool_status():
+    # This worker's pools only; compare across workers by pid
+    return {
+        "pid": os.getpid(),
+        "sync": pool_status(engine),
+        "async": pool_status(async_engine.sync_engine),
+        "passwords": passwords.status(),
+    }
+
+
+@app.get("/internal/cache", dependencies=[Depends(require_internal)])
+async def internal_cache_status(clear: bool = False):
+    # Response cache hit rates since startup (this worker's, for the memory backend)
+    status = response_cache.status()
+    if clear:
+        await response_cache.clear()
+    return {"pid": os.getpid(), **status}
+
+
+@app.get("/internal/queries", dependencies=[Depends(require_internal)])
+def internal_query_report(reset: bool = False):
+    # Routes by average query count since startup; needs QUERY_REPORT=1
+    routes = report.worst()
+    if reset:
+        report.clear()
+    return {
+        "pid": os.getpid(),
+        "enabled": QUERY_REPORT,
+        "n_plus_one_threshold": N_PLUS_ONE_THRESHOLD,
+        "routes": routes,
+    }
@@ -0,0 +1,62 @@
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+from database import SessionLocal
+from principal import principal_is_cached, resolve_principal
+
+
+class SessionMiddleware:
+    """
+    Pure ASGI middleware that owns the database session for each HTTP request.
+    The session is opened before routing, shared with routes through
+    request.state.db (see get_db), used to resolve the current user, and always
+    closed once the response has been sent, even if the app raises. Async
+    routes use their own AsyncSession (see get_async_db) instead.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        db = SessionLocal()
+        try:
+            request.state.db = db
+            # Only a cache miss queries; a hit stays off the threadpool
+            if principal_is_cached(request):
+                self._load_user(request, db)
+            else:
+                await run_in_threadpool(self._load_user, request, db, True)
+            await self.app(scope, receive, send)
+        finally:
+            # A session that never connected (e.g. async routes) closes without I/O
+            if db.in_transaction():
+                await run_in_threadpool(db.close)
+            else:
+                db.close()
+
+    @staticmethod
+    def _load_user(request: Request, db, looked_up: bool = False):
+        # Resolve the current user once; routes read it back from request.state
+        current_user = resolve_principal(request, db)
+        if looked_up:
+            # A cache miss may have queried, and the connection would otherwise
+            # stay checked out until the response is sent, alongside the async
+            # routes' own. Detach the loaded user so the rollback can't
+            # expire it, then attach it again without I/O
+            if current_user is not None:
+                db.expunge(current_user)
+            db.rollback()
+            if current_user is not None:
+                current_user = db.merge(current_user, load=False)
+        request.state.current_user = current_user
+
+        # The badge count is maintained on the user row, so this is free
+        unread_notifications_count = 0
+        if current_user:
+            unread_notifications_count = current_user.unread_notifications_count
+        request.state.unread_notifications_count = unread_notifications_count
@@ -1,10 +1,31 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Table, Text, DateTime, Float, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Table, Text, DateTime, Float, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.sql.expression import FunctionElement
 from datetime import datetime
 
 Base = declarative_base()
 
+
+class utcnow(FunctionElement):
+    # The database's current UTC time as a naive timestamp, like datetime.utcnow()
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    # SQLite's 'now' is UTC. Stored as text in SQLAlchemy's own format (six
+    # fractional digits), or values wouldn't compare correctly with bound ones
+    return "(strftime('%Y-%m-%d %H:%M:%f000', 'now'))"
+
+
+@compiles(utcnow, "postgresql")
+def _utcnow_postgresql(element, compiler, **kw):
+    return "timezone('utc', now())"
+
+
 class UserAssociation(Base):
     __tablename__ = "user_associations"
     id = Column(Integer, primary_key=True, index=True)
@@ -14,14 +35,22 @@ class UserAssociation(Base):
     user = relationship("User", foreign_keys=[user_id], back_populates="following")
     friend = relationship("User", foreign_keys=[friend_id], back_populates="followers")
 
+    __table_args__ = (
+        Index("uq_user_associations_user_friend", "user_id", "friend_id", unique=True),
+        Index("ix_user_associations_friend_id", "friend_id"),
+    )
+
 class Notification(Base):
     __tablename__ = "notifications"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     source_user_id = Column(Integer, ForeignKey("users.id"))
-    message = Column(String, index=True)
+    message = Column(String)
     read = Column(Boolean, default=False)
-    timestamp = Column(String, default=datetime.utcnow)
+    # The server default covers older code that only writes the legacy column
+    timestamp = Column("created_at", DateTime, nullable=False, default=datetime.utcnow, server_default=utcnow())
+    # Pre-DateTime string column, still written so older code keeps working; see backfill.py
+    legacy_timestamp = deferred(Column("timestamp", String, default=lambda: str(datetime.utcnow())))
     notification_type = Column(String, default="general")
 
     # Relationship for the user who receives the notification
@@ -30,6 +59,11 @@ class Notification(Base):
     # Relationship for the user who triggered the notification (the source user)
     source_user = relationship("User", back_populates="sent_notifications", foreign_keys=[source_user_id])
 
+    __table_args__ = (
+        Index("ix_notifications_user_created_at", "user_id", "created_at", "id"),
+        Index("ix_notifications_user_read_created_at", "user_id", "read", "created_at"),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
@@ -37,14 +71,20 @@ class User(Base):
     name = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
+    # Maintained alongside notification writes, see counters.py
+    unread_notifications_count = Column(Integer, nullable=False, default=0, server_default="0")
+    follower_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped whenever the user's profile page changes; keys its ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow)
 
     # 'user_id' in the user_associations table represents the user who is following
-    following = relationship("UserAssociation", foreign_keys=[UserAssociation.user_id], back_populates="user")
+    following = relationship("UserAssociation", foreign_keys=[UserAssociation.user_id], back_populates="user", order_by=UserAssociation.id)
 
     # 'friend_id' in the user_associations table represents the user being followed
-    followers = relationship("UserAssociation", foreign_keys=[UserAssociation.friend_id], back_populates="friend")
+    followers = relationship("UserAssociation", foreign_keys=[UserAssociation.friend_id], back_populates="friend", order_by=UserAssociation.id)
 
-    interests = relationship("UserInterest", back_populates="user")
+    interests = relationship("UserInterest", back_populates="user", order_by="UserInterest.id")
     feed_items = relationship("FeedItem", back_populates="user")
     notifications = relationship("Notification", back_populates="user", lazy="dynamic", foreign_keys=[Notification.user_id])
     sent_notifications = relationship("Notification", back_populates="source_user", foreign_keys=[Notification.source_user_id])
@@ -55,15 +95,34 @@ class Climb(Base):
     name = Column(String, nullable=False)
     grade_yds = Column(String, nullable=True)  # YDS grading
     grade_font = Column(String, nullable=True)  # Font grading
+    # Sortable difficulty parsed from the grade strings, see grades.py
+    grade_yds_value = Column(Float, nullable=True)
+    grade_boulder_value = Column(Float, nullable=True)
     description = Column(Text, nullable=True)
     location = Column(String, nullable=True)
     protection = Column(String, nullable=True)
     area_id = Column(String, ForeignKey("areas.id"), nullable=False)  # Foreign key to Area
     latitude = Column(Float, nullable=True)  # Latitude field
     longitude = Column(Float, nullable=True)  # Longitude field
+    # Derived from latitude/longitude for spatial lookups, see geo.py
+    geohash = Column(String(12), nullable=True)
+    # Hash of the imported OpenBeta fields, so a sync only rewrites changed rows
+    content_hash = Column(String(32), nullable=True)
+    # Bumped whenever the climb's page changes; keys its cached fragment and ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow)
 
     area = relationship("Area", back_populates="climbs")
 
+    __table_args__ = (
+        Index("ix_climbs_name_id", "name", "id"),
+        Index("ix_climbs_area_id_name_id", "area_id", "name", "id"),
+        Index("ix_climbs_geohash", "geohash"),
+        Index("ix_climbs_latitude", "latitude"),
+        Index("ix_climbs_grade_yds_value_name_id", "grade_yds_value", "name", "id"),
+        Index("ix_climbs_grade_boulder_value_name_id", "grade_boulder_value", "name", "id"),
+    )
+
 # User Interests Table
 class UserInterest(Base):
     __tablename__ = "user_interests"
@@ -74,6 +133,10 @@ class UserInterest(Base):
     user = relationship("User")
     climb = relationship("Climb")
 
+    __table_args__ = (
+        Index("uq_user_interests_user_climb", "user_id", "climb_id", unique=True),
+    )
+
 class FeedItem(Base):
     __tablename__ = "feed_items"
     id = Column(Integer, primary_key=True, index=True)
@@ -84,6 +147,21 @@ class FeedItem(Base):
 
     user = relationship("User", back_populates="feed_items")
 
+Index("ix_feed_items_user_timestamp", FeedItem.user_id, FeedItem.timestamp.desc())
+
+# Materialized home timeline: one row per (reader, feed item), written by timeline.py
+class TimelineEntry(Base):
+    __tablename__ = "timeline_entries"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    feed_item_id = Column(Integer, ForeignKey("feed_items.id"), primary_key=True)
+    timestamp = Column(DateTime, nullable=False)
+
+    feed_item = relationship("FeedItem")
+
+    __table_args__ = (
+        Index("ix_timeline_entries_user_timestamp", "user_id", "timestamp", "feed_item_id"),
+    )
+
 class Area(Base):
     __tablename__ = "areas"
     id = Column(String, primary_key=True, index=True)  # Change id to String type
@@ -91,6 +169,42 @@ class Area(Base):
     parent_id = Column(String, ForeignKey("areas.id"), nullable=True)  # Change parent_id to String
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
+    # Hash of the imported OpenBeta fields, see bulk_loader.py
+    content_hash = Column(String(32), nullable=True)
+    # Bumped whenever the area's page changes; keys its cached fragment and ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow)
 
     children = relationship("Area", backref="parent", remote_side=[id])
     climbs = relationship("Climb", back_populates="area")
+
+# Closure table for the area hierarchy: one row per (ancestor, descendant) pair,
+# including each area paired with itself at depth 0. Maintained by area_tree.py
+class AreaClosure(Base):
+    __tablename__ = "area_closure"
+    ancestor_id = Column(String, ForeignKey("areas.id"), primary_key=True)
+    descendant_id = Column(String, ForeignKey("areas.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_area_closure_descendant_depth", "descendant_id", "depth"),
+    )
+
+# Version stamps for process-local caches, bumped whenever the cached data changes
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# Areas and climbs that disappeared from OpenBeta, recorded by a full sync.
+# The rows themselves are kept since users may still reference them
+class SyncDeletion(Base):
+    __tablename__ = "sync_deletions"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # "area" or "climb"
+    record_id = Column(String, nullable=False)
+    detected_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("uq_sync_deletions_kind_record", "kind", "record_id", unique=True),
+    )
@@ -1,110 +1,75 @@
-import requests
+import argparse
+import asyncio
+import json
+import os
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from database import SessionLocal
-from models import Area, Climb
+from database import SessionLocal, init_db
+from bulk_loader import BATCH_SIZE, BulkLoader
+from open_beta_fetch import API_URL, CONCURRENCY, Checkpoint, OpenBetaFetcher
 
-API_URL = "https://api.openbeta.io/graphql"
+# Regions imported when none are given
+DEFAULT_REGIONS = os.getenv("OPENBETA_REGIONS", "Tennessee").split(",")
 
-# Fetch Tennessee areas data from OpenBeta's API
-def fetch_openbeta_data():
-    query = """
-    {
-      areas(filter: {area_name: {match: "Tennessee"}}, sort: {}) {
-        id
-        area_name
-        metadata {
-          lat
-          lng
-        }
-        children {
-          id
-          area_name
-          metadata {
-            lat
-            lng
-          }
-          climbs {
-            id
-            name
-            grades {
-              yds
-              font
-            }
-            content {
-              description
-              location
-              protection
-            }
-            metadata {
-              lat
-              lng
-            }
-          }
-        }
-      }
-    }
-    """
-    response = requests.post(API_URL, json={"query": query})
-    return response.json()["data"]
+def seed_database(data: dict, batch_size=BATCH_SIZE):
+    # Loads a saved single-level response (root areas with children and climbs)
+    db: Session = SessionLocal()
+    loader = BulkLoader(db, batch_size=batch_size)
 
-def get_or_create_area(db: Session, area_data, parent_id=None):
-    # Check if the area already exists
-    existing_area = db.query(Area).filter(Area.id == area_data["id"]).first()
-    if existing_area:
-        return existing_area
-    # Create a new area, setting the parent_id if provided
-    new_area = Area(
-        id=str(area_data["id"]),
-        name=area_data["area_name"],
-        latitude=area_data["metadata"].get("lat"),
-        longitude=area_data["metadata"].get("lng"),
-        parent_id=parent_id  # Set the parent_id
-    )
-    db.add(new_area)
-    db.commit()
-    return new_area
+    try:
+        # Process Areas and Climbs
+        for area in data["areas"]:
+            # Process the root area (parent)
+            parent_id = loader.add_area(area)
 
-# Check if a Climb exists by its ID
-def get_or_create_climb(db: Session, climb_data, area_id):
-    existing_climb = db.query(Climb).filter(Climb.id == climb_data["id"]).first()
-    if existing_climb:
-        return existing_climb
-    new_climb = Climb(
-        id=str(climb_data["id"]),
-        name=climb_data["name"],
-        grade_yds=climb_data["grades"].get("yds"),
-        grade_font=climb_data["grades"].get("font"),
-        description=climb_data["content"].get("description"),
-        location=climb_data["content"].get("location"),
-        protection=climb_data["content"].get("protection"),
-        area_id=area_id,
-        latitude=climb_data["metadata"].get("lat"),
-        longitude=climb_data["metadata"].get("lng"),
-    )
-    db.add(new_climb)
-    db.commit()
-    return new_climb
+            # Process child areas and set their parent_id to the parent area’s id
+            for child in area["children"]:
+                child_id = loader.add_area(child, parent_id=parent_id)
 
-def seed_database():
-    db: Session = SessionLocal()
-    data = fetch_openbeta_data()
+                # Process Climbs under each child area
+                for climb in child["climbs"]:
+                    loader.add_climb(climb, child_id)
 
-    # Process Areas and Climbs
-    for area in data["areas"]:
-        # Process the root area (parent)
-        parent_area = get_or_create_area(db, area)
+        loader.finish()
+        print(loader.summary())
+    finally:
+        db.close()
 
-        # Process child areas and set their parent_id to the parent area’s id
-        for child in area["children"]:
-            child_area = get_or_create_area(db, child, parent_id=parent_area.id)
 
-            # Process Climbs under each child area
-            for climb in child["climbs"]:
-                get_or_create_climb(db, climb, child_area.id)
+def import_regions(regions: list[str], checkpoint_path: str | None, batch_size=BATCH_SIZE,
+                   api_url=API_URL, concurrency=CONCURRENCY):
+    # Syncs each region's whole tree from the API, resuming from checkpoint_path if it exists
+    db: Session = SessionLocal()
+    loader = BulkLoader(db, batch_size=batch_size)
+    fetcher = OpenBetaFetcher(loader, Checkpoint(checkpoint_path), api_url=api_url, concurrency=concurrency)
 
-    db.close()
+    try:
+        asyncio.run(fetcher.run(regions))
+        print(f"Fetched {fetcher.pages_fetched} pages")
+        print(loader.summary())
+    finally:
+        db.close()
 
 
 if __name__ == "__main__":
-    seed_database()
+    parser = argparse.ArgumentParser(description="Import areas and climbs from OpenBeta.")
+    parser.add_argument("--fixture", help="load a saved GraphQL response (its \"data\" object) instead of calling the API")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--region", action="append", dest="regions", help="region to import (repeatable)")
+    parser.add_argument("--checkpoint", default="openbeta_checkpoint.json",
+                        help="progress file; an interrupted import resumes from it")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+
+    init_db()
+    if args.fixture:
+        with open(args.fixture) as f:
+            seed_database(json.load(f), batch_size=args.batch_size)
+    else:
+        import_regions(
+            args.regions or DEFAULT_REGIONS,
+            args.checkpoint,
+            batch_size=args.batch_size,
+            api_url=args.api_url,
+            concurrency=args.concurrency,
+        )
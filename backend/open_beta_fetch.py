@@ -0,0 +1,216 @@
+import asyncio
+import json
+import os
+import httpx
+from bulk_loader import BulkLoader
+
+API_URL = os.getenv("OPENBETA_API_URL", "https://api.openbeta.io/graphql")
+
+# Requests in flight at once
+CONCURRENCY = int(os.getenv("OPENBETA_CONCURRENCY", "8"))
+
+REQUEST_RETRIES = 3
+
+REGION_QUERY = """
+query ($name: String!) {
+  areas(filter: {area_name: {match: $name}}, sort: {}) {
+    uuid
+    id
+    area_name
+    metadata {
+      lat
+      lng
+    }
+  }
+}
+"""
+
+# One "page" is an area's direct children, with their climbs, and just enough
+# of the grandchildren to know which children need fetching in turn
+AREA_QUERY = """
+query ($uuid: ID) {
+  area(uuid: $uuid) {
+    children {
+      uuid
+      id
+      area_name
+      metadata {
+        lat
+        lng
+      }
+      children {
+        uuid
+      }
+      climbs {
+        id
+        name
+        grades {
+          yds
+          font
+        }
+        content {
+          description
+          location
+          protection
+        }
+        metadata {
+          lat
+          lng
+        }
+      }
+    }
+  }
+}
+"""
+
+
+class Checkpoint:
+    """
+    Import progress saved as JSON after every committed batch. `frontier` only
+    ever holds pages whose parent rows are committed, so a resumed import can
+    load them straight away; pages that were fetched but not yet committed are
+    simply fetched again.
+    """
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self.frontier = {}
+        self.done = set()
+
+    def load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            state = json.load(f)
+        self.frontier = {key: tuple(page) for key, page in state["frontier"].items()}
+        self.done = set(state["done"])
+        return True
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"frontier": self.frontier, "done": sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class OpenBetaFetcher:
+    """
+    Walks the OpenBeta area tree for a list of regions with a bounded number
+    of concurrent requests, streaming every page into a BulkLoader as it
+    arrives. Pages are keyed "region:<name>" for the root lookup and by area
+    uuid below that.
+    """
+
+    def __init__(self, loader: BulkLoader, checkpoint: Checkpoint, api_url: str = API_URL,
+                 concurrency: int = CONCURRENCY, transport: httpx.AsyncBaseTransport | None = None):
+        self.loader = loader
+        self.checkpoint = checkpoint
+        self.api_url = api_url
+        self.concurrency = concurrency
+        self.transport = transport
+        self.pages_fetched = 0
+        self.root_ids = []
+        # Pages loaded since the last commit, with the child pages they found
+        self._unflushed = {}
+        loader.on_flush = self._on_flush
+
+    async def run(self, regions: list[str]):
+        resumed = self.checkpoint.load()
+        if not resumed:
+            for region in regions:
+                self.checkpoint.frontier[f"region:{region}"] = ("region", region, None)
+
+        queue = asyncio.Queue()
+        for key, page in self.checkpoint.frontier.items():
+            if key not in self.checkpoint.done:
+                queue.put_nowait((key, page))
+
+        async with httpx.AsyncClient(transport=self.transport, timeout=60) as client:
+            workers = [asyncio.create_task(self._worker(client, queue)) for _ in range(self.concurrency)]
+            all_done = asyncio.create_task(queue.join())
+            try:
+                # Workers only ever finish by raising
+                await asyncio.wait([all_done, *workers], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in [all_done, *workers]:
+                    task.cancel()
+                results = await asyncio.gather(*workers, return_exceptions=True)
+
+        errors = [result for result in results if not isinstance(result, asyncio.CancelledError)]
+        if errors:
+            # Commit what was fully loaded so a re-run resumes after it. The
+            # loader skips on_flush when nothing was left buffered, though
+            # pages may still be waiting to be marked done
+            self.loader.flush()
+            self._on_flush()
+            raise errors[0]
+
+        if not resumed:
+            # Only a walk that saw every page can tell what went missing upstream
+            self.loader.record_deletions(self.root_ids)
+        self.loader.finish()
+        self.checkpoint.remove()
+
+    async def _worker(self, client: httpx.AsyncClient, queue: asyncio.Queue):
+        while True:
+            key, page = await queue.get()
+            try:
+                children = await self._fetch_page(client, page)
+                for child_key, child_page in children:
+                    queue.put_nowait((child_key, child_page))
+                self._unflushed[key] = children
+            finally:
+                queue.task_done()
+
+    async def _fetch_page(self, client: httpx.AsyncClient, page: tuple) -> list[tuple]:
+        kind, value, area_id = page
+        if kind == "region":
+            data = await self._query(client, REGION_QUERY, {"name": value})
+            roots = data["areas"]
+            for root in roots:
+                self.root_ids.append(self.loader.add_area(root))
+            return [(root["uuid"], ("area", root["uuid"], str(root["id"]))) for root in roots]
+
+        data = await self._query(client, AREA_QUERY, {"uuid": value})
+        children = (data.get("area") or {}).get("children") or []
+        next_pages = []
+        for child in children:
+            child_id = self.loader.add_area(child, parent_id=area_id)
+            for climb in child.get("climbs") or []:
+                self.loader.add_climb(climb, child_id)
+            if child.get("children"):
+                next_pages.append((child["uuid"], ("area", child["uuid"], child_id)))
+        return next_pages
+
+    async def _query(self, client: httpx.AsyncClient, query: str, variables: dict) -> dict:
+        for attempt in range(REQUEST_RETRIES):
+            try:
+                response = await client.post(self.api_url, json={"query": query, "variables": variables})
+                response.raise_for_status()
+                payload = response.json()
+                if payload.get("errors"):
+                    raise RuntimeError(f"OpenBeta returned errors: {payload['errors']}")
+                self.pages_fetched += 1
+                return payload["data"]
+            except httpx.HTTPError:
+                if attempt == REQUEST_RETRIES - 1:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+    def _on_flush(self):
+        # Everything loaded so far is committed: those pages are done and
+        # their children become safe resume points
+        for key, children in self._unflushed.items():
+            self.checkpoint.done.add(key)
+            self.checkpoint.frontier.pop(key, None)
+            for child_key, child_page in children:
+                if child_key not in self.checkpoint.done:
+                    self.checkpoint.frontier[child_key] = child_page
+        self._unflushed = {}
+        self.checkpoint.save()
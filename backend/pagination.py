@@ -0,0 +1,65 @@
+import base64
+import json
+import os
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import literal, tuple_
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+
+
+class Page:
+    def __init__(self, items: list, next_cursor: str | None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None, *types) -> tuple | None:
+    """
+    Decodes an opaque cursor produced by encode_cursor back into a tuple of
+    `types`. Raises a 400 for anything that was not produced by us.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        return tuple(
+            datetime.fromisoformat(value) if type_ is datetime else type_(value)
+            for type_, value in zip(types, values, strict=True)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_of(items: list, limit: int, key) -> Page:
+    # `items` holds up to limit + 1 rows; the extra one only signals another page
+    if len(items) <= limit:
+        return Page(items, None)
+    items = items[:limit]
+    return Page(items, encode_cursor(*key(items[-1])))
+
+
+def seek(query, columns, cursor: tuple | None, descending: bool = True):
+    """
+    Orders `query` by `columns` (most significant first, the last one unique)
+    and skips everything up to and including `cursor`. Backed by a composite
+    index on the same columns this is a single range scan.
+    """
+    if cursor is not None:
+        bound = tuple_(*[literal(value, column.type) for column, value in zip(columns, cursor)])
+        if descending:
+            query = query.filter(tuple_(*columns) < bound)
+        else:
+            query = query.filter(tuple_(*columns) > bound)
+    return query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+
+
+def paginate(query, columns, key, cursor: tuple | None, limit: int = PAGE_SIZE, descending: bool = True) -> Page:
+    items = seek(query, columns, cursor, descending).limit(limit + 1).all()
+    return page_of(items, limit, key)
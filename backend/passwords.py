@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException
+from auth import hash_password, verify_and_update_password
+
+logger = logging.getLogger(__name__)
+
+# bcrypt is CPU-bound and holds the GIL, so hashing runs in worker processes
+# instead of the request threadpool, where a burst of logins would starve
+# every other sync route
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(os.cpu_count() or 1, 4))))
+# Password checks allowed to wait for a worker; beyond that requests get a 503
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+# Seconds a rejected client is asked to wait before retrying
+PASSWORD_RETRY_AFTER = int(os.getenv("PASSWORD_RETRY_AFTER", "2"))
+
+
+class PasswordPool:
+    """
+    A process pool for password hashing and verification with a bounded
+    backlog. At most `workers` jobs run at once and `queue_limit` more wait;
+    anything past that fails straight away with a 503 rather than queueing
+    behind work that would outlast the client's patience. If a worker dies
+    (OOM kill, segfault) the broken pool is replaced and the job retried
+    once.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, queue_limit: int = PASSWORD_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Forks the workers up front, at startup, rather than under the first login burst
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor.submit(os.getpid).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def _replace(self, broken: ProcessPoolExecutor):
+        # Jobs that failed on the same broken pool all land here; only the first replaces it
+        with self._lock:
+            if self._executor is not broken:
+                return
+            logger.warning("Password worker died, restarting the pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.restarts += 1
+
+    @staticmethod
+    def _unavailable(detail: str) -> HTTPException:
+        return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(PASSWORD_RETRY_AFTER)})
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise self._unavailable("Too many sign-ins in progress, please try again shortly")
+        self.start()
+        self.pending += 1
+        try:
+            for _ in range(2):
+                executor = self._executor
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+                except BrokenProcessPool:
+                    self._replace(executor)
+            raise self._unavailable("Sign-in is temporarily unavailable, please try again shortly")
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, password_hash: str) -> tuple[bool, str | None]:
+        # (valid, replacement hash if the stored one used another cost factor)
+        return await self._run(verify_and_update_password, password, password_hash)
+
+    def status(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+
+passwords = PasswordPool()
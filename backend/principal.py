@@ -0,0 +1,107 @@
+import os
+import time
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from auth import decode_access_token
+from cache import TTLCache
+from models import User
+
+# Seconds a resolved user stays cached per token, and how many tokens we keep.
+# The cache is per worker and invalidation only reaches the worker that made
+# the change, so the TTL is also how long other workers may keep honouring a
+# user after a password change, ban or logout: keep it short
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+# token -> detached User snapshot
+_principals = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+
+def token_from_request(request: Request) -> str | None:
+    token = request.cookies.get("access_token")
+    if not token:
+        return None
+    return token.replace("Bearer ", "")
+
+
+def principal_is_cached(request: Request) -> bool:
+    # True when resolve_principal can answer without touching the database
+    token = token_from_request(request)
+    return token is None or _principals.get(token) is not None
+
+
+def resolve_principal(request: Request, db: Session) -> User | None:
+    """
+    Returns the user the request's access token belongs to, attached to `db`,
+    or None if the request is not authenticated.
+    Users are cached per token so hot sessions skip both the JWT decode and the
+    user lookup. The cached copy is detached and merged into `db` without a
+    SELECT; relationships are left unloaded and lazy-load from `db` as usual.
+    """
+    token = token_from_request(request)
+    if not token:
+        return None
+
+    cached = _principals.get(token)
+    if cached is not None:
+        return db.merge(cached, load=False)
+
+    payload = decode_access_token(token)
+    if not payload or not payload.get("sub"):
+        return None
+
+    user = db.query(User).filter(User.email == payload["sub"]).first()
+    if not user:
+        return None
+
+    # Never cache past the token's own expiry
+    ttl = None
+    if payload.get("exp"):
+        ttl = payload["exp"] - time.time()
+
+    # Cache a detached snapshot, and hand the request its own attached copy so
+    # nothing loaded during the request leaks into the cache
+    db.expunge(user)
+    _principals.set(token, user, ttl=ttl)
+    return db.merge(user, load=False)
+
+
+def invalidate_user(user_id: int):
+    _principals.discard_where(lambda user: user.id == user_id)
+
+
+def forget_token(token: str | None):
+    # This worker only; others drop the token within PRINCIPAL_CACHE_TTL
+    if token:
+        _principals.pop(token)
+
+
+def invalidate_user_on_commit(db: Session, user_id: int):
+    """
+    Evicts the user from this worker's principal cache once `db` commits.
+    Use this for bulk UPDATEs, which bypass the mapper events below. Other
+    workers serve their cached copy until it expires (PRINCIPAL_CACHE_TTL).
+    """
+    db.info.setdefault("stale_principals", set()).add(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # Not at flush time: until the commit, a concurrent request would read
+    # the old row and cache it again for the full TTL
+    db = object_session(target)
+    if db is not None:
+        invalidate_user_on_commit(db, target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop("stale_principals", ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_users(session):
+    session.info.pop("stale_principals", None)
@@ -0,0 +1,32 @@
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session, aliased
+from models import Climb, User, UserAssociation, UserInterest
+
+
+def shared_interests_for(db: Session, user_id: int) -> dict[Climb, list[User]]:
+    """
+    Maps each climb the user is projecting to the followed users projecting it
+    too, in one round trip: the user's interests self-joined against the
+    interests of the people they follow.
+    """
+    mine = aliased(UserInterest)
+    theirs = aliased(UserInterest)
+    followed = select(UserAssociation.friend_id).where(UserAssociation.user_id == user_id)
+
+    rows = (
+        db.query(Climb, User)
+        .select_from(mine)
+        .join(Climb, Climb.id == mine.climb_id)
+        .outerjoin(theirs, and_(theirs.climb_id == mine.climb_id, theirs.user_id.in_(followed)))
+        .outerjoin(User, User.id == theirs.user_id)
+        .filter(mine.user_id == user_id)
+        .order_by(mine.id, User.name)
+        .all()
+    )
+
+    shared_interests = {}
+    for climb, friend in rows:
+        friends = shared_interests.setdefault(climb, [])
+        if friend is not None and friend not in friends:
+            friends.append(friend)
+    return shared_interests
@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from markupsafe import Markup
+
+logger = logging.getLogger(__name__)
+
+# Where rendered page fragments live: unset for an LRU in each worker, or a
+# redis:// URL for any Redis-protocol server shared by all workers
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+# Byte budget of the in-process LRU, per worker
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Seconds an entry is kept. Keys change on every write (they carry the row
+# version), so this only bounds how long superseded entries linger
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+
+class MemoryBackend:
+    """
+    In-process LRU of rendered fragments, bounded by the total size of keys
+    and values rather than by entry count, since pages vary a lot in size.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES, ttl: float = RESPONSE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: bytes):
+        cost = len(key) + len(value)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self.size += cost
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    async def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    async def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _remove(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= len(key) + len(entry[0])
+
+    async def close(self):
+        pass
+
+    def info(self) -> dict:
+        return {"backend": "memory", "entries": len(self._data), "bytes": self.size, "max_bytes": self.max_bytes}
+
+
+class RedisBackend:
+    """
+    Fragments in a Redis-protocol server, shared by every worker. Entries
+    expire after `ttl` and the server's own maxmemory policy does the
+    eviction. A failing server degrades to cache misses rather than errors.
+    """
+
+    def __init__(self, url: str, ttl: int = RESPONSE_CACHE_TTL, prefix: str = "page:"):
+        # Only needed when RESPONSE_CACHE_URL is set
+        import redis.asyncio as redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.errors = (redis.RedisError, OSError)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.failures = 0
+
+    def _failed(self, operation: str, exc: Exception):
+        self.failures += 1
+        logger.warning("Response cache %s failed: %s", operation, exc)
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            return await self.client.get(self.prefix + key)
+        except self.errors as exc:
+            self._failed("get", exc)
+            return None
+
+    async def set(self, key: str, value: bytes):
+        try:
+            await self.client.set(self.prefix + key, value, ex=self.ttl)
+        except self.errors as exc:
+            self._failed("set", exc)
+
+    async def delete(self, key: str):
+        try:
+            await self.client.delete(self.prefix + key)
+        except self.errors as exc:
+            self._failed("delete", exc)
+
+    async def clear(self):
+        # Only our own keys; the server may be shared
+        try:
+            keys = [key async for key in self.client.scan_iter(match=self.prefix + "*", count=1000)]
+            for start in range(0, len(keys), 1000):
+                await self.client.delete(*keys[start:start + 1000])
+        except self.errors as exc:
+            self._failed("clear", exc)
+
+    async def close(self):
+        await self.client.aclose()
+
+    def info(self) -> dict:
+        return {"backend": "redis", "prefix": self.prefix, "failures": self.failures}
+
+
+class ResponseCache:
+    """
+    Caches rendered page fragments under (namespace, entity id, version).
+    Writes never delete entries: they bump the version of every row whose
+    pages change (see versions.bump_row_versions), so readers in any worker
+    compute a new key and the old entry ages out.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        # hits / misses per namespace
+        self.stats = {}
+
+    async def fragment(self, namespace: str, entity_id, version: int, render) -> Markup:
+        """
+        Returns the cached fragment, or calls `render` (a coroutine function
+        returning HTML) on a miss and caches its result.
+        """
+        key = f"{namespace}:{entity_id}:v{version}"
+        stats = self.stats.setdefault(namespace, Counter())
+        cached = await self.backend.get(key)
+        if cached is not None:
+            stats["hits"] += 1
+            return Markup(cached.decode())
+
+        stats["misses"] += 1
+        html = await render()
+        await self.backend.set(key, html.encode())
+        return Markup(html)
+
+    def status(self) -> dict:
+        namespaces = {
+            namespace: {
+                "hits": stats["hits"],
+                "misses": stats["misses"],
+                "hit_ratio": round(stats["hits"] / (stats["hits"] + stats["misses"]), 3),
+            }
+            for namespace, stats in self.stats.items()
+        }
+        return {**self.backend.info(), "namespaces": namespaces}
+
+    async def clear(self):
+        await self.backend.clear()
+        self.stats.clear()
+
+
+response_cache = ResponseCache(RedisBackend(RESPONSE_CACHE_URL) if RESPONSE_CACHE_URL else MemoryBackend())
@@ -0,0 +1,173 @@
+import re
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from models import Area, Climb
+
+# Search structures live outside the models since they differ per dialect:
+# a generated tsvector column with a GIN index on Postgres, and a contentless
+# FTS5 table kept in step by triggers on SQLite. install_search creates
+# whichever is missing and is safe to run on every startup.
+
+# Relative weight of each climb field in the ranking
+CLIMB_WEIGHTS = {"name": "A", "location": "B", "description": "C"}
+
+POSTGRES_VECTORS = {
+    "climbs": " || ".join(
+        f"setweight(to_tsvector('english', coalesce({column}, '')), '{weight}')"
+        for column, weight in CLIMB_WEIGHTS.items()
+    ),
+    "areas": "to_tsvector('english', coalesce(name, ''))",
+}
+
+SQLITE_COLUMNS = {
+    "climbs": list(CLIMB_WEIGHTS),
+    "areas": ["name"],
+}
+
+# bm25 weights for climbs_fts, in SQLITE_COLUMNS order
+SQLITE_CLIMB_WEIGHTS = "10.0, 5.0, 1.0"
+
+
+def _install_postgres(connection: Connection):
+    for table, vector in POSTGRES_VECTORS.items():
+        exists = connection.execute(
+            text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = :table AND column_name = 'search_vector'"
+            ),
+            {"table": table},
+        ).first()
+        if not exists:
+            # Rewrites the table once; later writes keep the column current
+            connection.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+                f"GENERATED ALWAYS AS ({vector}) STORED"
+            ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)"
+        ))
+
+
+def _install_sqlite(connection: Connection):
+    for table, columns in SQLITE_COLUMNS.items():
+        fts = f"{table}_fts"
+        # The ids are strings, and a plain table's implicit rowid changes when
+        # a migration rebuilds it (or on VACUUM), so each id gets a stable
+        # integer key to use as the FTS rowid
+        keys = f"{table}_fts_keys"
+        triggers = [f"{fts}_{event}" for event in ("insert", "update", "delete")]
+        installed = set(connection.scalars(
+            text("SELECT name FROM sqlite_master WHERE name IN :names").bindparams(bindparam("names", expanding=True)),
+            {"names": [keys, *triggers]},
+        ))
+        if len(installed) == len(triggers) + 1:
+            continue
+        # Start over: this is the earlier layout keyed by the implicit rowid,
+        # or a batch migration rebuilt the table, which drops its triggers
+        for trigger in triggers:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        connection.execute(text(f"DROP TABLE IF EXISTS {fts}"))
+        connection.execute(text(f"DROP TABLE IF EXISTS {keys}"))
+
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        new_key = f"(SELECT key FROM {keys} WHERE id = new.id)"
+        old_key = f"(SELECT key FROM {keys} WHERE id = old.id)"
+        connection.execute(text(f"CREATE TABLE {keys} (key INTEGER PRIMARY KEY, id VARCHAR NOT NULL UNIQUE)"))
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({column_list}, content='', tokenize='porter unicode61')"
+        ))
+        # A contentless table can only drop a row given the values it indexed
+        connection.execute(text(
+            f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {keys}(id) VALUES (new.id); "
+            f"INSERT INTO {fts}(rowid, {column_list}) VALUES ({new_key}, {new_values}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', {old_key}, {old_values}); "
+            f"DELETE FROM {keys} WHERE id = old.id; END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER {fts}_update AFTER UPDATE OF id, {column_list} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', {old_key}, {old_values}); "
+            f"UPDATE {keys} SET id = new.id WHERE id = old.id; "
+            f"INSERT INTO {fts}(rowid, {column_list}) VALUES ({new_key}, {new_values}); END"
+        ))
+        # Index whatever rows the table already holds
+        connection.execute(text(f"INSERT INTO {keys}(id) SELECT id FROM {table}"))
+        connection.execute(text(
+            f"INSERT INTO {fts}(rowid, {column_list}) "
+            f"SELECT {keys}.key, {', '.join(f'{table}.{column}' for column in columns)} "
+            f"FROM {table} JOIN {keys} ON {keys}.id = {table}.id"
+        ))
+
+
+def install_search(bind: Engine | Connection):
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return install_search(connection)
+
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        _install_postgres(bind)
+    elif dialect == "sqlite":
+        _install_sqlite(bind)
+    else:
+        raise RuntimeError(f"Full-text search is not supported on {dialect}")
+
+
+def _fts5_query(q: str) -> str:
+    # Quote every term so user input can't use (or break) FTS5 query syntax
+    return " ".join(f'"{term}"' for term in re.findall(r"\w+", q))
+
+
+def _ranked_ids(db: Session, table: str, q: str, limit: int, offset: int) -> list[str]:
+    # Every match is scored, so a page is the same whichever order the
+    # matches come back in and paging reaches all of them
+    dialect = db.get_bind().dialect.name
+    params = {"limit": limit, "offset": offset}
+    if dialect == "postgresql":
+        params["q"] = q
+        sql = (
+            f"SELECT id FROM {table}, websearch_to_tsquery('english', :q) AS query "
+            f"WHERE search_vector @@ query "
+            f"ORDER BY ts_rank_cd(search_vector, query) DESC, id LIMIT :limit OFFSET :offset"
+        )
+    elif dialect == "sqlite":
+        params["q"] = _fts5_query(q)
+        if not params["q"]:
+            return []
+        weights = SQLITE_CLIMB_WEIGHTS if table == "climbs" else "1.0"
+        sql = (
+            f"SELECT {table}_fts_keys.id FROM {table}_fts "
+            f"JOIN {table}_fts_keys ON {table}_fts_keys.key = {table}_fts.rowid "
+            f"WHERE {table}_fts MATCH :q "
+            f"ORDER BY bm25({table}_fts, {weights}), {table}_fts_keys.id LIMIT :limit OFFSET :offset"
+        )
+    else:
+        raise RuntimeError(f"Full-text search is not supported on {dialect}")
+    return [row_id for (row_id,) in db.execute(text(sql), params)]
+
+
+def _load_in_order(db: Session, model, ids: list[str]) -> list:
+    by_id = {row.id: row for row in db.query(model).filter(model.id.in_(ids))}
+    return [by_id[row_id] for row_id in ids if row_id in by_id]
+
+
+def search_climbs(db: Session, q: str, limit: int, offset: int = 0) -> list[Climb]:
+    # Best match first over name, location and description
+    return _load_in_order(db, Climb, _ranked_ids(db, "climbs", q, limit, offset))
+
+
+def search_areas(db: Session, q: str, limit: int, offset: int = 0) -> list[Area]:
+    return _load_in_order(db, Area, _ranked_ids(db, "areas", q, limit, offset))
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    install_search(engine)
+    print("Search structures installed.")
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from database import SessionLocal, init_db
 from models import User
 from auth import hash_password
 
@@ -35,6 +35,7 @@ def seed_climbs(db: Session):
 
 
 if __name__ == "__main__":
+    init_db()
     db = SessionLocal()
     try:
         #seed_users(db)
@@ -0,0 +1,80 @@
+import os
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+# Where compiled templates are kept between restarts and shared by workers;
+# unset for Jinja's per-user directory under the system temp dir
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")
+# Characters of rendered HTML buffered before each chunk is sent; Jinja
+# yields many tiny strings, one per template node
+TEMPLATE_STREAM_CHUNK = int(os.getenv("TEMPLATE_STREAM_CHUNK", "16384"))
+
+
+def _chunks(parts, size: int):
+    buffer, buffered = [], 0
+    for part in parts:
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= size:
+            yield "".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+class Templates(Jinja2Templates):
+    """
+    Jinja2Templates over an Environment with a bytecode cache, so templates
+    are compiled once per deploy rather than once per worker, plus a
+    streaming variant of TemplateResponse for long list pages.
+    """
+
+    def __init__(self, directory: str = TEMPLATES_DIR, cache_dir: str | None = TEMPLATE_CACHE_DIR):
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        env = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=True,
+            bytecode_cache=FileSystemBytecodeCache(cache_dir),
+        )
+        super().__init__(env=env)
+
+    def warm(self) -> int:
+        # Compiles (or loads from the bytecode cache) every template up front,
+        # at startup, so the first request for each page doesn't pay for it
+        names = self.env.list_templates(extensions=["html"])
+        for name in names:
+            self.env.get_template(name)
+        return len(names)
+
+    def StreamingTemplateResponse(self, name: str, context: dict, status_code: int = 200, headers: dict | None = None,
+                                  background: BackgroundTask | None = None) -> StreamingResponse:
+        """
+        Like TemplateResponse, but renders with Template.generate() while the
+        body is being sent, so the layout goes out before the list rows are
+        rendered and the page is never held in memory as one string.
+        Rendering runs in the threadpool. Headers are sent before rendering
+        starts, so an error in the template aborts the connection instead of
+        returning a 500, and everything the template reads must be loaded
+        already (see loaders.py) or come from a session that outlives the
+        response (get_db's).
+        """
+        request = context.get("request")
+        if request is None:
+            raise ValueError('context must include a "request" key')
+        for processor in self.context_processors:
+            context.update(processor(request))
+        template = self.get_template(name)
+        return StreamingResponse(
+            _chunks(template.generate(context), TEMPLATE_STREAM_CHUNK),
+            status_code=status_code,
+            headers=headers,
+            media_type="text/html",
+            background=background,
+        )
+
+
+templates = Templates()
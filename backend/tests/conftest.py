@@ -0,0 +1,77 @@
+import asyncio
+import os
+import tempfile
+
+# Configure before any app module reads its settings
+_database_dir = tempfile.mkdtemp(prefix="climbing-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("PASSWORD_WORKERS", "1")
+os.environ.setdefault("RAISE_ON_LAZY_LOAD", "true")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+import main
+from area_index import invalidate_area_index
+from database import SessionLocal, engine
+from models import Base, User
+from principal import _principals
+from response_cache import response_cache
+
+PASSWORD = "password"
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    # One app for the whole run; the lifespan creates the schema
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def clean_state(app_client):
+    yield
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(delete(table))
+    _principals.clear()
+    invalidate_area_index()
+    asyncio.run(response_cache.clear())
+
+
+@pytest.fixture
+def client(app_client):
+    app_client.cookies.clear()
+    return app_client
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def sign_up(client):
+    """
+    Creates a user through the signup form and returns their id; with
+    login=True the client is then logged in as them.
+    """
+
+    def sign_up(name: str, login: bool = False) -> int:
+        email = f"{name.lower()}@example.com"
+        response = client.post("/signup", data={"name": name, "email": email, "password": PASSWORD}, follow_redirects=False)
+        assert response.status_code == 302, response.text
+        if login:
+            client.cookies.clear()
+            response = client.post("/login", data={"email": email, "password": PASSWORD}, follow_redirects=False)
+            assert response.status_code == 302, response.text
+        with SessionLocal() as db:
+            return db.query(User.id).filter(User.email == email).scalar()
+
+    return sign_up
@@ -0,0 +1,30 @@
+from bulk_loader import BulkLoader
+from database import SessionLocal
+from versions import AREAS, get_version
+
+
+def load(db, areas: int, batch_size: int) -> list[int]:
+    # The area stamp another worker sees after each committed batch
+    seen = []
+
+    def stamp():
+        with SessionLocal() as other:
+            seen.append(get_version(other, AREAS))
+
+    loader = BulkLoader(db, batch_size=batch_size, on_flush=stamp)
+    root_id = loader.add_area({"id": "root", "area_name": "Root"})
+    for n in range(areas):
+        area_id = loader.add_area({"id": f"area-{n}", "area_name": f"Area {n}"}, root_id)
+        loader.add_climb({"id": f"climb-{n}", "name": f"Climb {n}"}, area_id)
+    loader.finish()
+    return seen
+
+
+def test_each_committed_batch_moves_the_area_stamp(db):
+    # 1 root + 9 areas + 9 climbs in batches of 4: the first 4 batches flush
+    # early, the rest on finish
+    seen = load(db, areas=9, batch_size=4)
+    assert seen == [1, 2, 3, 4, 5]
+
+    # Nothing changed upstream, so nothing for the workers to reload
+    assert load(db, areas=9, batch_size=4) == [5, 5, 5, 5, 5]
@@ -0,0 +1,53 @@
+import random
+import pytest
+from geo import haversine_km, nearby_climbs
+from models import Area, Climb
+
+# (lat, lng) centres of clusters of climbs: low and mid latitudes, the
+# antimeridian, Lofoten and near the north pole
+CENTRES = [(0.5, 10.0), (35.0, -85.0), (-33.9, 151.2), (52.0, 179.9), (68.5, 13.0), (89.5, 0.0)]
+
+
+@pytest.fixture
+def climbs(db):
+    rng = random.Random(7)
+    db.add(Area(id="geo", name="Geo"))
+    points = []
+    for centre_lat, centre_lng in CENTRES:
+        # A dense core and a sparse spread up to ~1000 km out
+        for n in range(40):
+            spread = 0.05 if n < 20 else 9.0
+            lat = max(-90.0, min(90.0, centre_lat + rng.uniform(-spread, spread)))
+            lng = (centre_lng + rng.uniform(-spread, spread) * 3 + 180) % 360 - 180
+            points.append((lat, lng))
+    db.add_all(
+        Climb(id=f"geo-{n}", name=f"Geo {n}", area_id="geo", latitude=lat, longitude=lng)
+        for n, (lat, lng) in enumerate(points)
+    )
+    db.commit()
+    return {f"geo-{n}": point for n, point in enumerate(points)}
+
+
+def brute_force(climbs: dict, lat: float, lng: float, radius_km: float, k: int) -> list[tuple[str, float]]:
+    distances = sorted(
+        (haversine_km(lat, lng, climb_lat, climb_lng), climb_id) for climb_id, (climb_lat, climb_lng) in climbs.items()
+    )
+    return [(climb_id, distance) for distance, climb_id in distances if distance <= radius_km][:k]
+
+
+@pytest.mark.parametrize("lat, lng", CENTRES + [(68.5, 20.0), (-70.0, 0.0), (89.9, 180.0)])
+@pytest.mark.parametrize("radius_km, k", [(0.5, 5), (25, 5), (100, 5), (500, 5), (500, 100)])
+def test_nearby_matches_brute_force(db, climbs, lat, lng, radius_km, k):
+    nearest = [(climb.id, distance) for climb, distance in nearby_climbs(db, lat, lng, radius_km, k)]
+    expected = brute_force(climbs, lat, lng, radius_km, k)
+    assert [climb_id for climb_id, _ in nearest] == [climb_id for climb_id, _ in expected]
+    assert [distance for _, distance in nearest] == pytest.approx([distance for _, distance in expected])
+
+
+def test_wider_radius_never_loses_results(db):
+    db.add(Area(id="lofoten", name="Lofoten"))
+    db.add(Climb(id="svolvaer", name="Svolvaer Goat", area_id="lofoten", latitude=68.0, longitude=13.0))
+    db.commit()
+    # 55.6 km away, found at 100 km and must still be found at 500 km
+    for radius_km in (100, 500):
+        assert [climb.id for climb, _ in nearby_climbs(db, 68.5, 13.0, radius_km, k=5)] == ["svolvaer"]
@@ -0,0 +1,121 @@
+import re
+import pytest
+from fastapi import HTTPException
+from grades import BOULDER, YDS, filter_by_grade, parse_grade
+from models import Area, Climb
+
+RESULT = re.compile(r'href="/climb/([^"]+)"')
+
+# (typed grade, parsed as an upper bound, expected (system, value))
+PARSED = [
+    ("5.9", False, (YDS, 9.0)),
+    ("5.9+", False, (YDS, 9.5)),
+    ("5.9-", False, (YDS, 8.7)),
+    # A bare 5.10 spans 5.10a-d: the bottom as a minimum, the top as a maximum
+    ("5.10", False, (YDS, 10.0)),
+    ("5.10", True, (YDS, 10.75)),
+    ("5.10a", False, (YDS, 10.0)),
+    ("5.10a", True, (YDS, 10.0)),
+    ("5.10d", False, (YDS, 10.75)),
+    ("5.10b/c", False, (YDS, 10.375)),
+    ("5.10+", False, (YDS, 10.625)),
+    ("5.10+", True, (YDS, 10.625)),
+    ("5.10-", False, (YDS, 10.125)),
+    (" 5.12C ", False, (YDS, 12.5)),
+    ("4th class", False, (YDS, -1.0)),
+    ("VB", False, (BOULDER, -1.0)),
+    ("V0", False, (BOULDER, 0.0)),
+    ("v4", False, (BOULDER, 4.0)),
+    ("V4+", False, (BOULDER, 4.3)),
+    ("V4-5", False, (BOULDER, 4.5)),
+    ("V12", False, (BOULDER, 12.0)),
+    # Font grades are placed on the V scale
+    ("6A", False, (BOULDER, 3.0)),
+    ("6b+", False, (BOULDER, 4.5)),
+    ("7A+", False, (BOULDER, 7.0)),
+    ("8A", False, (BOULDER, 11.0)),
+]
+
+INVALID = ["", "hard", "V", "2", "10a", "6", "9B"]
+
+# id -> (grade_yds, grade_font), as OpenBeta sends them: V grades arrive in
+# the yds field
+CLIMBS = {
+    "nine": ("5.9", None),
+    "ten-a": ("5.10a", None),
+    "ten-c": ("5.10c", None),
+    "ten-d": ("5.10d", None),
+    "eleven-a": ("5.11a", None),
+    "v3": ("V3", None),
+    "font-7a": (None, "7A"),
+}
+
+# (grade_min, grade_max, ids in range)
+RANGES = [
+    (None, None, set(CLIMBS)),
+    ("5.10", None, {"ten-a", "ten-c", "ten-d", "eleven-a"}),
+    (None, "5.10", {"nine", "ten-a", "ten-c", "ten-d"}),
+    ("5.10", "5.10", {"ten-a", "ten-c", "ten-d"}),
+    ("5.10b", "5.10c", {"ten-c"}),
+    ("5.10+", None, {"ten-d", "eleven-a"}),
+    (None, "5.9+", {"nine"}),
+    ("V2", "V4", {"v3"}),
+    ("6C", None, {"font-7a"}),
+    ("V0", "6A+", {"v3"}),
+]
+
+
+@pytest.fixture
+def climbs(db):
+    db.add(Area(id="crag", name="Crag"))
+    db.add_all(
+        Climb(id=climb_id, name=climb_id.title(), area_id="crag", grade_yds=grade_yds, grade_font=grade_font)
+        for climb_id, (grade_yds, grade_font) in CLIMBS.items()
+    )
+    db.commit()
+
+
+@pytest.mark.parametrize("grade, upper, expected", PARSED)
+def test_parse_grade(grade, upper, expected):
+    system, value = parse_grade(grade, upper=upper)
+    assert (system, value) == (expected[0], pytest.approx(expected[1]))
+
+
+@pytest.mark.parametrize("grade", INVALID)
+def test_unrecognized_grades_are_a_400(grade):
+    with pytest.raises(HTTPException) as raised:
+        parse_grade(grade)
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize("grade_min, grade_max, expected", RANGES)
+def test_filter_by_grade(db, climbs, grade_min, grade_max, expected):
+    query, _ = filter_by_grade(db.query(Climb), grade_min, grade_max)
+    assert {climb.id for climb in query} == expected
+
+
+@pytest.mark.parametrize("grade_min, grade_max", [("5.10a", "V4"), ("6A", "5.11")])
+def test_mixed_systems_are_a_400(client, sign_up, db, climbs, grade_min, grade_max):
+    with pytest.raises(HTTPException) as raised:
+        filter_by_grade(db.query(Climb), grade_min, grade_max)
+    assert raised.value.status_code == 400
+
+    sign_up("Alice", login=True)
+    response = client.get("/climbs", params={"grade_min": grade_min, "grade_max": grade_max})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("params, expected", [
+    # Ungraded and boulder climbs drop out of a route grade sort
+    ({"sort": "grade"}, ["nine", "ten-a", "ten-c", "ten-d", "eleven-a"]),
+    ({"sort": "-grade"}, ["eleven-a", "ten-d", "ten-c", "ten-a", "nine"]),
+    ({"sort": "grade", "grade_max": "5.10"}, ["nine", "ten-a", "ten-c", "ten-d"]),
+    # A boulder range sorts on the boulder scale
+    ({"sort": "grade", "grade_min": "VB"}, ["v3", "font-7a"]),
+    ({"sort": "-grade", "grade_min": "VB"}, ["font-7a", "v3"]),
+])
+def test_climbs_sorted_by_grade(client, sign_up, climbs, params, expected):
+    sign_up("Alice", login=True)
+    response = client.get("/climbs", params=params)
+    assert response.status_code == 200
+    assert RESULT.findall(response.text) == expected
@@ -0,0 +1,76 @@
+import re
+from datetime import datetime
+import pytest
+from area_tree import rebuild_closure
+from instrumentation import max_queries
+from models import Area, Climb
+from pagination import encode_cursor
+
+# Tables that grow with users and content; a plan must never walk one of them
+BIG_TABLES = {"climbs", "notifications", "feed_items", "timeline_entries", "user_associations", "user_interests", "area_closure"}
+
+NOW = encode_cursor(datetime(2030, 1, 1), 10**6)
+GRADE_CURSOR = encode_cursor(10.0, "Climb 1", "climb-1")
+
+# The routes behind the hot reads (and the writes that look rows up first),
+# each with a big table its statements should reach through an index
+ROUTES = [
+    ("GET", "/feed", "timeline_entries"),
+    ("GET", f"/feed?before={NOW}", "feed_items"),
+    ("GET", "/notifications", "notifications"),
+    ("GET", f"/notifications?before={NOW}", "notifications"),
+    ("GET", f"/climbs?sort=grade&grade_min=5.9&grade_max=5.11a&after={GRADE_CURSOR}", "climbs"),
+    ("GET", f"/climbs?sort=-grade&grade_min=V2&after={GRADE_CURSOR}", "climbs"),
+    ("GET", "/area/root/climbs", "area_closure"),
+    ("GET", f"/area/root/climbs?sort=grade&grade_min=5.9&after={GRADE_CURSOR}", "climbs"),
+    ("GET", "/climbs/nearby?lat=40.0&lng=-105.0&radius=50", "climbs"),
+    # Cells narrow towards the pole, so this takes the latitude band fallback
+    ("GET", "/climbs/nearby?lat=89.9&lng=0.0&radius=500", "climbs"),
+    ("POST", "/climbs/climb-0/interest", "user_interests"),
+    ("POST", "/users/{me}/friends", "user_associations"),
+]
+
+
+def query_plans(db, shapes) -> dict[str, list[str]]:
+    # SQLite's EXPLAIN QUERY PLAN for each captured read, one line per step.
+    # The planner doesn't look at bound values, so NULLs stand in for them
+    connection = db.connection()
+    plans = {}
+    for shape in shapes:
+        if shape.startswith(("SELECT", "WITH")):
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {shape}", (None,) * shape.count("?"))
+            plans[shape] = [row.detail for row in rows]
+    return plans
+
+
+@pytest.fixture
+def content(db):
+    db.add(Area(id="root", name="Root"))
+    db.add(Area(id="crag", name="Crag", parent_id="root"))
+    db.add_all(
+        Climb(id=f"climb-{n}", name=f"Climb {n}", area_id="crag", grade_yds="5.10a", grade_yds_value=10.0,
+              grade_font="6A", grade_boulder_value=3.0, latitude=40.0 + n / 100, longitude=-105.0)
+        for n in range(5)
+    )
+    db.add(Climb(id="polar", name="Polar", area_id="crag", latitude=89.8, longitude=10.0))
+    db.commit()
+    rebuild_closure(db)
+    db.commit()
+
+
+@pytest.mark.parametrize("method, path, table", ROUTES)
+def test_route_reads_use_indexes(client, sign_up, db, content, method, path, table):
+    friend = sign_up("Bob")
+    me = sign_up("Alice", login=True)
+    path = path.format(me=me)
+
+    with max_queries(100) as stats:
+        response = client.request(method, path, data={"friend_id": friend}, follow_redirects=False)
+    assert response.status_code in (200, 302, 303), response.text
+
+    plans = query_plans(db, stats.shapes)
+    steps = [step for plan in plans.values() for step in plan]
+    assert any(re.match(rf"SEARCH {table} USING .*INDEX", step) for step in steps), plans
+    for shape, plan in plans.items():
+        scans = [step for step in plan if step.startswith("SCAN ") and step.split()[1] in BIG_TABLES]
+        assert not scans, f"{shape}\n{plan}"
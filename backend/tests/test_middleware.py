@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import async_engine, engine
+from principal import _principals
+
+# Enough requests that a per-request leak would exhaust the pool several times over
+ROUNDS = 300
+
+PAGES = ["/", "/feed", "/notifications", "/users", "/climbs", "/areas", "/shared-interests", "/users/999999", "/climb/missing"]
+
+
+@pytest.fixture
+def open_connections():
+    # Connections checked out and not yet returned, across both engines; the
+    # async engine's SQLite pool keeps no count of its own
+    counts = {"open": 0, "peak": 0}
+
+    def checkout(*args):
+        counts["open"] += 1
+        counts["peak"] = max(counts["peak"], counts["open"])
+
+    def checkin(*args):
+        counts["open"] -= 1
+
+    pools = [engine.pool, async_engine.sync_engine.pool]
+    for pool in pools:
+        event.listen(pool, "checkout", checkout)
+        event.listen(pool, "checkin", checkin)
+    yield counts
+    for pool in pools:
+        event.remove(pool, "checkout", checkout)
+        event.remove(pool, "checkin", checkin)
+
+
+@pytest.fixture
+def open_transactions():
+    # Sessions (sync, or behind an AsyncSession) holding a transaction that
+    # was never committed, rolled back or closed
+    counts = {"open": 0}
+
+    def created(session, transaction):
+        if transaction.parent is None:
+            counts["open"] += 1
+
+    def ended(session, transaction):
+        if transaction.parent is None:
+            counts["open"] -= 1
+
+    event.listen(Session, "after_transaction_create", created)
+    event.listen(Session, "after_transaction_end", ended)
+    yield counts
+    event.remove(Session, "after_transaction_create", created)
+    event.remove(Session, "after_transaction_end", ended)
+
+
+def test_requests_return_their_connections(client, sign_up, open_connections, open_transactions):
+    sign_up("Alice", login=True)
+    for _ in range(ROUNDS):
+        for path in PAGES:
+            client.get(path)
+        # Error and redirect paths too: a failed form post and an anonymous page
+        client.post("/login", data={"email": "nobody@example.com", "password": "wrong"}, follow_redirects=False)
+    client.cookies.clear()
+    client.get("/feed", follow_redirects=False)
+
+    assert engine.pool.checkedout() == 0
+    assert open_connections["open"] == 0
+    assert open_transactions["open"] == 0
+
+
+@pytest.mark.parametrize("path", ["/feed", "/notifications"])
+def test_principal_lookup_returns_its_connection_before_async_routes_run(client, sign_up, open_connections, path):
+    sign_up("Alice", login=True)
+    # A principal cache miss looks the user up on the middleware's session
+    _principals.clear()
+    open_connections["peak"] = open_connections["open"]
+
+    assert client.get(path).status_code == 200
+    assert open_connections["peak"] == 1
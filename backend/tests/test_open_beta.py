@@ -0,0 +1,139 @@
+import asyncio
+import copy
+import json
+from pathlib import Path
+import httpx
+import pytest
+import open_beta_fetch
+from bulk_loader import BulkLoader
+from models import Area, AreaClosure, Climb, SyncDeletion
+from open_beta_fetch import REGION_QUERY, Checkpoint, OpenBetaFetcher
+
+# Recorded API responses, one file per page: region-<name>.json for the
+# region lookup and area-<uuid>.json for an area's children
+FIXTURES = Path(__file__).parent / "fixtures" / "openbeta"
+
+AREAS = {"tennessee", "obed", "foster-falls", "north-clear-creek", "lilly-bluff", "lilly-boulders"}
+CLIMBS = {"climb-satanic-verses", "climb-tierrany", "climb-tennessee-crack", "climb-maple-syrup", "climb-the-pearl"}
+LILLY_BLUFF = "area-b27c8e51-lilly-bluff"
+
+
+class OpenBetaStandIn:
+    """
+    Serves the recorded pages in place of the GraphQL API. Pages can be
+    edited to play upstream changes, or made to fail.
+    """
+
+    def __init__(self):
+        self.pages = {path.stem: json.loads(path.read_text()) for path in FIXTURES.glob("*.json")}
+        self.failing = set()
+        self.requested = []
+        self.transport = httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        variables = body["variables"]
+        page = f"region-{variables['name']}" if body["query"] == REGION_QUERY else f"area-{variables['uuid']}"
+        self.requested.append(page)
+        if page in self.failing:
+            return httpx.Response(502)
+        return httpx.Response(200, json=self.pages[page])
+
+    def children(self, page: str) -> list[dict]:
+        return self.pages[page]["data"]["area"]["children"]
+
+
+@pytest.fixture
+def stand_in():
+    return OpenBetaStandIn()
+
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    return tmp_path / "checkpoint.json"
+
+
+def sync(db, stand_in, checkpoint_path, batch_size=100, concurrency=4) -> BulkLoader:
+    loader = BulkLoader(db, batch_size=batch_size)
+    fetcher = OpenBetaFetcher(loader, Checkpoint(str(checkpoint_path)), api_url="http://openbeta.test/graphql",
+                              concurrency=concurrency, transport=stand_in.transport)
+    asyncio.run(fetcher.run(["Tennessee"]))
+    return loader
+
+
+def test_full_walk(db, stand_in, checkpoint_path):
+    loader = sync(db, stand_in, checkpoint_path)
+
+    # Leaf areas come with their parent's page and are never fetched
+    assert sorted(stand_in.requested) == sorted(["region-Tennessee", "area-6f0e3b2a-tennessee", "area-1c9d47e0-obed", LILLY_BLUFF])
+    assert {area.id for area in db.query(Area)} == AREAS
+    assert {climb.id for climb in db.query(Climb)} == CLIMBS
+    assert db.get(Area, "lilly-boulders").parent_id == "lilly-bluff"
+    assert db.get(Climb, "climb-the-pearl").grade_font == "7A"
+    assert {row.descendant_id for row in db.query(AreaClosure).filter(AreaClosure.ancestor_id == "tennessee")} == AREAS
+    assert loader.stats["areas"]["inserted"] == len(AREAS)
+    assert loader.stats["climbs"]["inserted"] == len(CLIMBS)
+    assert not checkpoint_path.exists()
+
+
+def test_failed_import_resumes_from_the_checkpoint(db, stand_in, checkpoint_path, monkeypatch):
+    monkeypatch.setattr(open_beta_fetch, "REQUEST_RETRIES", 1)
+    stand_in.failing.add(LILLY_BLUFF)
+    # One request at a time, so the pages before the failure are known
+    with pytest.raises(httpx.HTTPStatusError):
+        sync(db, stand_in, checkpoint_path, batch_size=3, concurrency=1)
+
+    # Every page whose rows are committed is done, and the failed one is
+    # the only place left to start from
+    assert json.loads(checkpoint_path.read_text()) == {
+        "frontier": {"b27c8e51-lilly-bluff": ["area", "b27c8e51-lilly-bluff", "lilly-bluff"]},
+        "done": ["1c9d47e0-obed", "6f0e3b2a-tennessee", "region:Tennessee"],
+    }
+    assert {area.id for area in db.query(Area)} == AREAS - {"lilly-boulders"}
+
+    stand_in.failing.clear()
+    stand_in.requested.clear()
+    sync(db, stand_in, checkpoint_path, batch_size=3, concurrency=1)
+
+    assert stand_in.requested == [LILLY_BLUFF]
+    assert {area.id for area in db.query(Area)} == AREAS
+    assert {climb.id for climb in db.query(Climb)} == CLIMBS
+    # Closure rows for the resumed page reach the ancestors loaded before it
+    assert {row.ancestor_id for row in db.query(AreaClosure).filter(AreaClosure.descendant_id == "lilly-boulders")} == {
+        "lilly-boulders", "lilly-bluff", "obed", "tennessee",
+    }
+    assert not checkpoint_path.exists()
+
+
+def test_unchanged_rows_are_skipped_on_a_rerun(db, stand_in, checkpoint_path):
+    sync(db, stand_in, checkpoint_path)
+    loader = sync(db, stand_in, checkpoint_path)
+
+    assert loader.stats["areas"] == {"unchanged": len(AREAS), "inserted": 0, "updated": 0, "deleted": 0}
+    assert loader.stats["climbs"] == {"unchanged": len(CLIMBS), "inserted": 0, "updated": 0, "deleted": 0}
+    assert {climb.version for climb in db.query(Climb)} == {1}
+
+
+def test_upstream_updates_and_deletions(db, stand_in, checkpoint_path):
+    original = copy.deepcopy(stand_in.pages)
+    sync(db, stand_in, checkpoint_path)
+
+    # Upstream regrades one climb and drops Foster Falls with its climbs
+    stand_in.children("area-1c9d47e0-obed")[1]["climbs"][0]["grades"]["yds"] = "5.10a"
+    tennessee = stand_in.children("area-6f0e3b2a-tennessee")
+    tennessee[:] = [area for area in tennessee if area["id"] != "foster-falls"]
+    loader = sync(db, stand_in, checkpoint_path)
+
+    assert loader.stats["climbs"]["updated"] == 1
+    assert loader.stats["climbs"]["deleted"] == 2
+    assert loader.stats["areas"]["deleted"] == 1
+    maple_syrup = db.get(Climb, "climb-maple-syrup")
+    assert (maple_syrup.grade_yds, maple_syrup.version) == ("5.10a", 2)
+    assert {(row.kind, row.record_id) for row in db.query(SyncDeletion)} == {
+        ("area", "foster-falls"), ("climb", "climb-satanic-verses"), ("climb", "climb-tierrany"),
+    }
+
+    # Back upstream, so no longer recorded as deleted
+    stand_in.pages = original
+    sync(db, stand_in, checkpoint_path)
+    assert db.query(SyncDeletion).count() == 0
@@ -0,0 +1,38 @@
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from models import Notification
+from pagination import PAGE_SIZE
+
+NEXT_PAGE = re.compile(r'href="/notifications\?before=([^"]+)"')
+
+
+def test_notifications_page_through_rows_written_by_older_code(client, sign_up, db):
+    me = sign_up("Alice", login=True)
+    started = datetime.utcnow() - timedelta(days=1)
+    # Interleave rows the current code writes with rows older code writes,
+    # which only set the legacy string column
+    for n in range(PAGE_SIZE * 2 + 5):
+        if n % 2:
+            db.execute(
+                text("INSERT INTO notifications (user_id, message, read, timestamp) VALUES (:user_id, :message, 0, :legacy)"),
+                {"user_id": me, "message": f"notification {n}", "legacy": str(started)},
+            )
+        else:
+            db.add(Notification(user_id=me, message=f"notification {n}", timestamp=started + timedelta(minutes=n)))
+    db.commit()
+    assert db.query(Notification).filter(Notification.timestamp.is_(None)).count() == 0
+
+    seen = []
+    path = "/notifications"
+    for _ in range(5):
+        if not path:
+            break
+        response = client.get(path)
+        assert response.status_code == 200
+        seen += re.findall(r"notification \d+", response.text)
+        cursor = NEXT_PAGE.search(response.text)
+        path = f"/notifications?before={cursor.group(1)}" if cursor else None
+    assert path is None, "paging did not finish"
+
+    assert sorted(seen) == sorted(f"notification {n}" for n in range(PAGE_SIZE * 2 + 5))
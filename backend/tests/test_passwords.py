@@ -0,0 +1,36 @@
+import asyncio
+import os
+import signal
+import pytest
+from fastapi import HTTPException
+from passwords import PasswordPool
+
+
+@pytest.fixture
+def pool():
+    pool = PasswordPool(workers=1, queue_limit=4)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_recovers_from_a_killed_worker(pool):
+    for pid in list(pool._executor._processes):
+        os.kill(pid, signal.SIGKILL)
+
+    password_hash = asyncio.run(pool.hash("correct horse"))
+    valid, _ = asyncio.run(pool.verify("correct horse", password_hash))
+    assert valid
+    assert pool.restarts == 1
+    assert pool.pending == 0
+
+
+def test_pool_gives_up_with_a_503_when_the_retry_dies_too(pool):
+    # os._exit takes the worker down with it on every attempt
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(pool._run(os._exit, 1))
+    assert raised.value.status_code == 503
+    assert "Retry-After" in raised.value.headers
+
+    # and the pool after that is a working one
+    assert asyncio.run(pool.hash("still works"))
@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from instrumentation import max_queries, track_queries
+from models import Area, Climb
+
+USERS = 8
+CLIMBS = 6
+
+# Statements per page for a signed-in user, whatever the number of follows,
+# projects and feed items. The area and climb pages are served from the
+# response cache once warm.
+PAGE_QUERY_LIMITS = {
+    "/": 7,
+    "/feed": 2,
+    "/notifications": 2,
+    "/users": 1,
+    "/users/{me}": 5,
+    "/shared-interests": 1,
+    "/climbs": 2,
+    "/areas": 0,
+    "/area/root": 0,
+    "/climb/climb-0": 1,
+}
+
+
+@pytest.fixture
+def busy_user(client, sign_up, db):
+    # Everyone projects every climb and follows everyone signed up before
+    # them, through the routes so feed items and notifications fan out
+    db.add(Area(id="root", name="Root"))
+    db.add_all(Climb(id=f"climb-{n}", name=f"Climb {n}", area_id="root", grade_yds="5.10a") for n in range(CLIMBS))
+    db.commit()
+
+    user_ids = []
+    for n in range(USERS):
+        user_ids.append(sign_up(f"User{n}", login=True))
+        for climb in range(CLIMBS):
+            client.post(f"/climbs/climb-{climb}/interest", follow_redirects=False)
+        for friend_id in user_ids[:-1]:
+            client.post(f"/users/{user_ids[-1]}/friends", data={"friend_id": friend_id}, follow_redirects=False)
+    # Still logged in as the last user, who follows everyone else
+    return user_ids[-1]
+
+
+@pytest.mark.parametrize("page", PAGE_QUERY_LIMITS)
+def test_page_query_ceiling(client, busy_user, page):
+    path = page.format(me=busy_user)
+    # Warm the principal and response caches
+    assert client.get(path).status_code == 200
+
+    with max_queries(PAGE_QUERY_LIMITS[page]):
+        response = client.get(path)
+    assert response.status_code == 200
+
+
+def test_failed_statements_are_timed_and_leave_no_timers(db):
+    connection = db.connection()
+    with track_queries() as stats:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM no_such_table"))
+            db.rollback()
+            connection = db.connection()
+        connection.execute(text("SELECT 1"))
+
+    assert stats.count == 4
+    assert not connection.info.get("query_started")
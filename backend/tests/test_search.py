@@ -0,0 +1,95 @@
+import re
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from database import engine, init_db
+from models import Area, Climb
+from pagination import PAGE_SIZE
+from search import search_areas, search_climbs
+
+RESULT = re.compile(r'href="/climb/([^"]+)"')
+
+
+def ids(results) -> list[str]:
+    return [row.id for row in results]
+
+
+@pytest.fixture
+def crag(db):
+    db.add(Area(id="crag", name="Crag"))
+    db.commit()
+
+
+def test_triggers_keep_the_index_in_step(db, crag):
+    db.add(Climb(id="arete", name="Granite Arete", area_id="crag"))
+    db.commit()
+    assert ids(search_climbs(db, "granite", limit=10)) == ["arete"]
+
+    db.get(Climb, "arete").name = "Sandstone Arete"
+    db.commit()
+    assert ids(search_climbs(db, "granite", limit=10)) == []
+    assert ids(search_climbs(db, "sandstone", limit=10)) == ["arete"]
+
+    db.delete(db.get(Climb, "arete"))
+    db.commit()
+    assert ids(search_climbs(db, "arete", limit=10)) == []
+
+    db.get(Area, "crag").name = "Lower Crag"
+    db.commit()
+    assert ids(search_areas(db, "lower", limit=10)) == ["crag"]
+
+
+def test_results_survive_a_table_rebuild(db, crag):
+    db.add_all(Climb(id=f"climb-{n}", name=f"Route{n}", area_id="crag") for n in range(5))
+    db.commit()
+    db.query(Climb).filter(Climb.id.in_(["climb-0", "climb-2"])).delete()
+    db.commit()
+    db.close()
+
+    # A batch migration copies the rows into a new table, renumbering the
+    # implicit rowids and dropping the triggers; startup reinstalls them
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)) as op:
+            with op.batch_alter_table("climbs", recreate="always"):
+                pass
+    init_db()
+
+    for n in (1, 3, 4):
+        assert ids(search_climbs(db, f"route{n}", limit=10)) == [f"climb-{n}"]
+    db.add(Climb(id="climb-5", name="Route5", area_id="crag"))
+    db.commit()
+    assert ids(search_climbs(db, "route5", limit=10)) == ["climb-5"]
+
+
+def test_name_matches_rank_above_location_and_description(db, crag):
+    # Many weak matches written first, the strongest last
+    db.add_all(
+        Climb(id=f"weak-{n:02}", name=f"Route {n}", description="A slab left of the dihedral", area_id="crag")
+        for n in range(40)
+    )
+    db.add(Climb(id="location", name="Pebble Wrestling", location="Below the dihedral", area_id="crag"))
+    db.add(Climb(id="name", name="Dihedral", area_id="crag"))
+    db.commit()
+
+    results = ids(search_climbs(db, "dihedral", limit=5))
+    assert results[:2] == ["name", "location"]
+    # Equal scores fall back to id order
+    assert results[2:] == ["weak-00", "weak-01", "weak-02"]
+
+
+def test_paging_reaches_every_match_once(client, sign_up, db, crag):
+    db.add_all(Climb(id=f"crack-{n:03}", name=f"Crack {n}", area_id="crag") for n in range(PAGE_SIZE * 2 + 3))
+    db.add(Climb(id="face", name="Face", area_id="crag"))
+    db.commit()
+    sign_up("Alice", login=True)
+
+    seen = []
+    for page in range(1, 5):
+        response = client.get("/search", params={"q": "crack", "page": page})
+        assert response.status_code == 200
+        found = RESULT.findall(response.text)
+        if not found:
+            break
+        seen += found
+    assert page == 4
+    assert sorted(seen) == sorted(set(seen)) == [f"crack-{n:03}" for n in range(PAGE_SIZE * 2 + 3)]
@@ -0,0 +1,128 @@
+import os
+from sqlalchemy import DateTime, Integer, insert, literal, select
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from loaders import FEED_CARD
+from models import FeedItem, TimelineEntry, User, UserAssociation
+from pagination import seek
+
+# Authors with more followers than this are not fanned out on write; their
+# followers pull their items at read time instead
+FANOUT_FOLLOWER_LIMIT = int(os.getenv("FANOUT_FOLLOWER_LIMIT", "5000"))
+
+# How many of a user's recent items are copied into a new follower's timeline
+TIMELINE_BACKFILL_LIMIT = int(os.getenv("TIMELINE_BACKFILL_LIMIT", "200"))
+
+
+def _fans_out(db: Session, user_id: int) -> bool:
+    follower_count = db.query(User.follower_count).filter(User.id == user_id).scalar()
+    return (follower_count or 0) <= FANOUT_FOLLOWER_LIMIT
+
+
+def publish(db: Session, feed_item: FeedItem):
+    """
+    Adds a feed item and pushes it onto its author's timeline and, unless the
+    author has too many followers, onto every follower's timeline. Runs in the
+    caller's transaction.
+    """
+    db.add(feed_item)
+    db.flush()  # assigns the id and timestamp
+
+    db.add(TimelineEntry(
+        user_id=feed_item.user_id,
+        feed_item_id=feed_item.id,
+        timestamp=feed_item.timestamp,
+    ))
+    if not _fans_out(db, feed_item.user_id):
+        return
+
+    followers = select(
+        UserAssociation.user_id,
+        literal(feed_item.id, Integer),
+        literal(feed_item.timestamp, DateTime),
+    ).where(UserAssociation.friend_id == feed_item.user_id)
+    db.execute(
+        insert(TimelineEntry).from_select(["user_id", "feed_item_id", "timestamp"], followers)
+    )
+
+
+def backfill(db: Session, follower_id: int, followee_id: int):
+    # Copies the followee's recent items into a new follower's timeline
+    if not _fans_out(db, followee_id):
+        return
+
+    recent = (
+        select(literal(follower_id, Integer), FeedItem.id, FeedItem.timestamp)
+        .where(FeedItem.user_id == followee_id)
+        .order_by(FeedItem.timestamp.desc())
+        .limit(TIMELINE_BACKFILL_LIMIT)
+    )
+    db.execute(
+        insert(TimelineEntry).from_select(["user_id", "feed_item_id", "timestamp"], recent)
+    )
+
+
+def read_timeline(db: Session, user_id: int, limit: int | None = None, before: tuple | None = None) -> list[FeedItem]:
+    """
+    Returns the user's home timeline, newest first, starting after the
+    (timestamp, id) cursor `before`: one range scan over timeline_entries,
+    merged with items pulled from followed accounts that are too large to fan
+    out.
+    """
+    # Authors are loaded up front (the FEED_CARD profile): cards render
+    # item.user, and async routes can't lazy-load once the query has returned
+    pushed = seek(
+        db.query(FeedItem)
+        .options(*FEED_CARD)
+        .join(TimelineEntry, TimelineEntry.feed_item_id == FeedItem.id)
+        .filter(TimelineEntry.user_id == user_id),
+        [TimelineEntry.timestamp, TimelineEntry.feed_item_id],
+        before,
+    )
+    pulled = seek(
+        db.query(FeedItem)
+        .options(*FEED_CARD)
+        .join(UserAssociation, UserAssociation.friend_id == FeedItem.user_id)
+        .join(User, User.id == UserAssociation.friend_id)
+        .filter(UserAssociation.user_id == user_id, User.follower_count > FANOUT_FOLLOWER_LIMIT),
+        [FeedItem.timestamp, FeedItem.id],
+        before,
+    )
+    if limit is not None:
+        pushed = pushed.limit(limit)
+        pulled = pulled.limit(limit)
+
+    # An account may have crossed the limit after some items were pushed
+    items = {item.id: item for item in pushed.all() + pulled.all()}
+    items = sorted(items.values(), key=timeline_key, reverse=True)
+    return items[:limit]
+
+
+def timeline_key(item: FeedItem) -> tuple:
+    return (item.timestamp, item.id)
+
+
+def rebuild_timelines(db: Session):
+    # Regenerates every timeline from feed_items and user_associations
+    db.query(TimelineEntry).delete(synchronize_session=False)
+    columns = ["user_id", "feed_item_id", "timestamp"]
+    db.execute(insert(TimelineEntry).from_select(
+        columns, select(FeedItem.user_id, FeedItem.id, FeedItem.timestamp)
+    ))
+    db.execute(insert(TimelineEntry).from_select(
+        columns,
+        select(UserAssociation.user_id, FeedItem.id, FeedItem.timestamp)
+        .join(FeedItem, FeedItem.user_id == UserAssociation.friend_id)
+        .join(User, User.id == FeedItem.user_id)
+        .where(User.follower_count <= FANOUT_FOLLOWER_LIMIT),
+    ))
+    db.commit()
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        rebuild_timelines(db)
+        print(f"Rebuilt timelines: {db.query(TimelineEntry).count()} entries.")
+    finally:
+        db.close()
@@ -0,0 +1,31 @@
+from datetime import datetime
+from sqlalchemy.orm import Session
+from models import CacheVersion
+
+# Names of the version stamps in cache_versions
+AREAS = "areas"
+
+
+def get_version(db: Session, name: str) -> int:
+    return db.query(CacheVersion.version).filter(CacheVersion.name == name).scalar() or 0
+
+
+def bump_version(db: Session, name: str):
+    # Runs in the caller's transaction so readers see the new stamp with the data
+    updated = db.query(CacheVersion).filter(CacheVersion.name == name).update(
+        {CacheVersion.version: CacheVersion.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.add(CacheVersion(name=name, version=1))
+
+
+def bump_row_versions(db: Session, model, condition):
+    """
+    Increments the version and updated_at of the `model` rows matching
+    `condition` (Area, Climb or User). The version keys their pages' cache
+    entries and ETags, see response_cache.py and etags.py.
+    Runs in the caller's transaction.
+    """
+    db.query(model).filter(condition).update(
+        {model.version: model.version + 1, model.updated_at: datetime.utcnow()}, synchronize_session=False
+    )